@@ -6,7 +6,7 @@ from structlog.contextvars import bind_contextvars, clear_contextvars
 
 from .config import Config
 from .utils.logging_config import setup_logging, get_logger
-from .services import db_service # Import db_service
+from .services import db_service, write_behind_service, data_transfer_service
 
 # Initialize logger early, but setup happens in create_app
 log = get_logger(__name__) # Get logger named 'app'
@@ -36,6 +36,8 @@ def create_app(config_class=Config):
     # --- Initialize Database ---
     db_service.init_app(app)
     log.info("Database service initialized.")
+    write_behind_service.init_app(app)
+    data_transfer_service.init_app(app) # 'flask export-data' / 'flask import-data'
 
     # --- Request ID Logging Middleware ---
     @app.before_request
@@ -58,9 +60,10 @@ def create_app(config_class=Config):
         return response
 
     # --- Register Blueprints (API routes) ---
-    from .routes import auth, system_message # Add system_message
+    from .routes import auth, system_message, data_transfer
     app.register_blueprint(auth.bp, url_prefix='/api/v1/auth')
     app.register_blueprint(system_message.bp, url_prefix='/api/v1/system_message')
+    app.register_blueprint(data_transfer.bp, url_prefix='/api/v1/data')
     # Add others later: chat, history, image
     # app.register_blueprint(history.bp, url_prefix='/api/v1/history')
     # app.register_blueprint(image.bp, url_prefix='/api/v1/image')
@@ -73,5 +76,10 @@ def create_app(config_class=Config):
         log.debug("Root endpoint accessed")
         return {"message": "MasterRobot API is running!", "environment": app.config['FLASK_ENV']}
 
+    @app.route('/health')
+    def health():
+        # Per-worker numbers: each gunicorn worker has its own write-behind queue
+        return {"status": "ok", "pid": os.getpid(), "write_behind": write_behind_service.stats()}
+
     log.info("App initialization complete.")
     return app
\ No newline at end of file
@@ -0,0 +1,50 @@
+# app/extensions.py
+from flask import current_app
+
+from app.utils.logging_config import get_logger
+from app.utils.process_local import ProcessLocal
+
+log = get_logger(__name__)
+
+class LazyClient(ProcessLocal):
+    """Holds a client that is only imported and built on first use.
+
+    The provider SDKs are heavy to import, so nothing here touches them until a
+    request actually needs a client. factory(config) is called with
+    current_app.config. The client is tied to the process that built it, which
+    keeps gunicorn's preload_app safe: a forked worker builds its own.
+    """
+
+    def __init__(self, name, factory):
+        super().__init__(factory)
+        self.name = name
+
+    def _build(self):
+        client = self._factory(current_app.config)
+        log.info("Lazy client initialized", client=self.name)
+        return client
+
+
+def _make_openai_client(config):
+    api_key = config.get('OPENAI_API_KEY')
+    if not api_key:
+        raise RuntimeError("OPENAI_API_KEY is not configured")
+    from openai import OpenAI # Deferred: importing the SDK is expensive
+    # Retries are handled by the provider gateway, which also paces them
+    return OpenAI(api_key=api_key, max_retries=0)
+
+def _make_gemini_client(config):
+    api_key = config.get('GEMINI_API_KEY')
+    if not api_key:
+        raise RuntimeError("GEMINI_API_KEY is not configured")
+    from google import genai # Deferred: importing the SDK is expensive
+    return genai.Client(api_key=api_key)
+
+
+openai_client = LazyClient('openai', _make_openai_client)
+gemini_client = LazyClient('gemini', _make_gemini_client)
+
+def reset_clients():
+    """Drops all cached provider clients (e.g. after a fork)."""
+    for client in (openai_client, gemini_client):
+        client.reset()
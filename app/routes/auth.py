@@ -39,6 +39,7 @@ def login_required(f):
              return jsonify({"error": "User not found for token"}), 401
 
         g.user = user # Store user dict (id, username, created_at) in g
+        auth_service.touch_last_seen(user['id'])
         log.debug("User authenticated via token", user_id=g.user['id'])
 
         return f(*args, **kwargs)
@@ -0,0 +1,33 @@
+# app/routes/data_transfer.py
+from flask import Blueprint, Response, request, jsonify, g, stream_with_context
+from app.services import data_transfer_service
+from app.routes.auth import login_required
+from app.utils.logging_config import get_logger
+
+log = get_logger(__name__)
+bp = Blueprint('data_transfer', __name__)
+
+@bp.route('/export', methods=['GET'])
+@login_required
+def export():
+    """Streams the logged-in user's data as a gzip-compressed NDJSON archive."""
+    user_id = g.user['id']
+    log.info("Data export requested", user_id=user_id)
+    # Password hashes never leave through the API; the CLI export includes them.
+    chunks = data_transfer_service.export_archive(user_id, include_password_hashes=False)
+    return Response(
+        stream_with_context(chunks),
+        mimetype='application/gzip',
+        headers={'Content-Disposition': f'attachment; filename="masterrobot-export-{user_id}.ndjson.gz"'}
+    )
+
+@bp.route('/import', methods=['POST'])
+@login_required
+def import_():
+    """Imports an archive (request body, gzip-compressed NDJSON) into the logged-in user's account."""
+    user_id = g.user['id']
+    counts, message = data_transfer_service.import_archive(request.stream, target_user_id=user_id)
+    if counts is None:
+        status_code = 400 if message.startswith("Invalid archive") else 500
+        return jsonify({"error": message}), status_code
+    return jsonify({"message": message, "imported": counts}), 200
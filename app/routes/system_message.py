@@ -38,6 +38,23 @@ def list_messages():
     messages = system_message_service.get_system_messages_for_user(user_id)
     return jsonify(messages), 200
 
+@bp.route('/search', methods=['GET'])
+@login_required
+def search():
+    """Semantic search over the logged-in user's system messages (?q=...&k=5)."""
+    user_id = g.user['id']
+    text = request.args.get('q', '').strip()
+    k = request.args.get('k', 5, type=int)
+    if not text:
+        return jsonify({"error": "Query parameter 'q' is required"}), 400
+    if not 1 <= k <= 50:
+        return jsonify({"error": "Parameter 'k' must be between 1 and 50"}), 400
+
+    results = system_message_service.search_system_messages(user_id, text, k)
+    if results is None:
+        return jsonify({"error": "Search failed"}), 500
+    return jsonify(results), 200
+
 @bp.route('/<int:message_id>', methods=['GET'])
 @login_required
 def get_message(message_id):
@@ -6,6 +6,7 @@ from flask import current_app
 
 # Use the db helper functions or direct cursor execution
 from .db_service import get_db, query_db, insert_db
+from . import write_behind_service
 from app.utils.logging_config import get_logger
 
 log = get_logger(__name__)
@@ -21,7 +22,7 @@ def register_user(username, password):
             return None, "Username already exists"
 
         # Hash the password
-        password_hash = generate_password_hash(password)
+        password_hash = generate_password_hash(password, method=current_app.config['PASSWORD_HASH_METHOD'])
 
         # Insert new user
         user_id = insert_db(
@@ -116,4 +117,13 @@ def find_user_by_id(user_id):
             return None
     except Exception as e:
         log.error("Exception finding user by ID", user_id=user_id, error=str(e), exc_info=True)
-        return None
\ No newline at end of file
+        return None
+
+def touch_last_seen(user_id):
+    """Records the user's last activity through the write-behind queue."""
+    try:
+        now = datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S') # Same format as CURRENT_TIMESTAMP
+        write_behind_service.record("UPDATE users SET last_seen_at = ? WHERE id = ?", (now, user_id))
+    except Exception as e:
+        # Never fail the request over a last-seen update
+        log.error("Exception recording last seen", user_id=user_id, error=str(e), exc_info=True)
@@ -0,0 +1,80 @@
+# app/services/chat_service.py
+from .db_service import query_db, insert_db
+from .context_service import count_message_tokens
+from app.utils.logging_config import get_logger
+
+log = get_logger(__name__)
+
+CHAT_ROLES = ('user', 'assistant')
+
+def create_chat_history(user_id, title):
+    """Creates a new chat history (conversation) for a user."""
+    try:
+        history_id = insert_db(
+            "INSERT INTO chat_histories (user_id, title) VALUES (?, ?)",
+            (user_id, title)
+        )
+        if history_id:
+            log.info("Chat history created", user_id=user_id, history_id=history_id)
+            return history_id, "Chat history created successfully."
+        else:
+            log.error("Chat history creation failed during insert", user_id=user_id)
+            return None, "Failed to create chat history."
+    except Exception as e:
+        log.error("Exception creating chat history", user_id=user_id, error=str(e), exc_info=True)
+        return None, "An internal error occurred."
+
+def get_chat_history_by_id(user_id, history_id):
+    """Retrieves a chat history by ID, ensuring it belongs to the user."""
+    try:
+        history = query_db(
+            "SELECT id, title, created_at FROM chat_histories WHERE id = ? AND user_id = ?",
+            (history_id, user_id),
+            one=True
+        )
+        if history:
+            return dict(history)
+        else:
+            log.warning("Chat history not found or access denied", user_id=user_id, history_id=history_id)
+            return None
+    except Exception as e:
+        log.error("Exception retrieving chat history by ID", user_id=user_id, history_id=history_id, error=str(e), exc_info=True)
+        return None
+
+def add_chat_message(user_id, history_id, role, content):
+    """Appends a message to a chat history, storing its token count alongside it."""
+    if role not in CHAT_ROLES:
+        return None, f"Role must be one of {', '.join(CHAT_ROLES)}."
+    try:
+        if get_chat_history_by_id(user_id, history_id) is None:
+            return None, "Chat history not found or access denied."
+
+        # Counted once here so context assembly never has to re-tokenize history
+        token_count = count_message_tokens(content)
+        message_id = insert_db(
+            "INSERT INTO chat_messages (history_id, role, content, token_count) VALUES (?, ?, ?, ?)",
+            (history_id, role, content, token_count)
+        )
+        if message_id:
+            log.debug("Chat message added", user_id=user_id, history_id=history_id, message_id=message_id, token_count=token_count)
+            return message_id, "Chat message added successfully."
+        else:
+            log.error("Chat message insert failed", user_id=user_id, history_id=history_id)
+            return None, "Failed to add chat message."
+    except Exception as e:
+        log.error("Exception adding chat message", user_id=user_id, history_id=history_id, error=str(e), exc_info=True)
+        return None, "An internal error occurred."
+
+def get_chat_messages(user_id, history_id):
+    """Retrieves all messages of a chat history in order, ensuring ownership."""
+    try:
+        if get_chat_history_by_id(user_id, history_id) is None:
+            return None
+        messages = query_db(
+            "SELECT id, role, content, token_count, created_at FROM chat_messages WHERE history_id = ? ORDER BY id ASC",
+            (history_id,)
+        )
+        return [dict(msg) for msg in messages]
+    except Exception as e:
+        log.error("Exception retrieving chat messages", user_id=user_id, history_id=history_id, error=str(e), exc_info=True)
+        return None
@@ -0,0 +1,191 @@
+# app/services/context_service.py
+import hashlib
+import re
+import threading
+from collections import OrderedDict, deque
+from flask import current_app
+
+from .db_service import query_db
+from .system_message_service import get_system_message_by_id
+from app.utils.logging_config import get_logger
+
+log = get_logger(__name__)
+
+# Approximation of a BPE tokenizer: roughly one token per 4 characters of a
+# word and one per punctuation mark. Swap count_tokens for the model's real
+# tokenizer if exact counts are ever needed; everything else builds on it.
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+MESSAGE_OVERHEAD_TOKENS = 4 # Role and framing added per chat message
+HISTORY_PAGE_SIZE = 100
+
+def count_tokens(text):
+    """Returns the (approximate) number of tokens in a piece of text."""
+    return sum((len(token) + 3) // 4 for token in _TOKEN_RE.findall(text))
+
+def count_message_tokens(content):
+    """Returns the tokens a message costs in a chat request, framing included."""
+    return count_tokens(content) + MESSAGE_OVERHEAD_TOKENS
+
+
+# --- Caches (per process) ---
+
+_lock = threading.Lock()
+_system_token_cache = OrderedDict() # sha256(content) -> token count
+_windows = OrderedDict() # history_id -> _HistoryWindow
+
+def _cache_put(cache, key, value):
+    """Inserts into an LRU OrderedDict, evicting the oldest entries. Caller holds _lock."""
+    cache[key] = value
+    cache.move_to_end(key)
+    while len(cache) > current_app.config['CONTEXT_CACHE_SIZE']:
+        cache.popitem(last=False)
+
+def get_system_message_tokens(content):
+    """Token count of a system message, cached by content hash."""
+    key = hashlib.sha256(content.encode('utf-8')).hexdigest()
+    with _lock:
+        if key in _system_token_cache:
+            _system_token_cache.move_to_end(key)
+            return _system_token_cache[key]
+    count = count_message_tokens(content)
+    with _lock:
+        _cache_put(_system_token_cache, key, count)
+    return count
+
+def clear_caches():
+    """Drops all cached token counts and history windows."""
+    with _lock:
+        _system_token_cache.clear()
+        _windows.clear()
+
+
+class _HistoryWindow:
+    """The newest messages of one chat history that fit in `budget` tokens.
+
+    Holds the longest suffix of the history that fits the budget, so a new turn
+    only needs the messages written since `last_id`.
+    """
+
+    def __init__(self, budget):
+        self.budget = budget
+        self.last_id = 0
+        self.messages = deque() # (id, role, content, token_count), oldest first
+        self.total = 0
+        self.complete = True # Window starts at the first message of the history
+        self.lock = threading.Lock()
+
+    def append(self, row):
+        self.messages.append((row['id'], row['role'], row['content'], row['token_count']))
+        self.total += row['token_count']
+        self.last_id = max(self.last_id, row['id'])
+
+    def trim(self, budget):
+        # Always keep the newest message, even if it alone exceeds the budget.
+        while self.total > budget and len(self.messages) > 1:
+            self.total -= self.messages.popleft()[3]
+            self.complete = False
+        self.budget = budget
+
+
+def _load_window(history_id, budget):
+    """Builds a window from scratch, walking the history backwards page by page."""
+    window = _HistoryWindow(budget)
+    collected = []
+    total = 0
+    before_id = None
+    while True:
+        if before_id is None:
+            rows = query_db(
+                "SELECT id, role, content, token_count FROM chat_messages WHERE history_id = ? ORDER BY id DESC LIMIT ?",
+                (history_id, HISTORY_PAGE_SIZE)
+            )
+        else:
+            rows = query_db(
+                "SELECT id, role, content, token_count FROM chat_messages WHERE history_id = ? AND id < ? ORDER BY id DESC LIMIT ?",
+                (history_id, before_id, HISTORY_PAGE_SIZE)
+            )
+        if rows is None:
+            return None
+        for row in rows:
+            if collected and total + row['token_count'] > budget:
+                window.complete = False
+                break
+            collected.append(row)
+            total += row['token_count']
+        else:
+            if len(rows) == HISTORY_PAGE_SIZE:
+                before_id = rows[-1]['id']
+                continue
+        break
+    for row in reversed(collected):
+        window.append(row)
+    return window
+
+def _refresh_window(window, history_id, budget):
+    """Brings a cached window up to date with messages written since it was built."""
+    rows = query_db(
+        "SELECT id, role, content, token_count FROM chat_messages WHERE history_id = ? AND id > ? ORDER BY id ASC",
+        (history_id, window.last_id)
+    )
+    if rows is None:
+        return False
+    for row in rows:
+        window.append(row)
+    window.trim(budget)
+    return True
+
+
+def assemble_context(user_id, history_id, system_message_id=None, max_tokens=None):
+    """Builds the message list for a chat request, trimmed to the model's context limit.
+
+    Combines the user's system message (if any) with the newest history messages
+    that fit in max_tokens minus CONTEXT_RESPONSE_RESERVE_TOKENS. Returns a dict
+    with 'messages', 'token_count' and 'truncated', or None on error / not found.
+    """
+    config = current_app.config
+    max_tokens = max_tokens or config['CONTEXT_MAX_TOKENS']
+    try:
+        history = query_db(
+            "SELECT id FROM chat_histories WHERE id = ? AND user_id = ?",
+            (history_id, user_id), one=True
+        )
+        if history is None:
+            log.warning("Context assembly for missing or foreign chat history", user_id=user_id, history_id=history_id)
+            return None
+
+        messages = []
+        system_tokens = 0
+        if system_message_id is not None:
+            system_message = get_system_message_by_id(user_id, system_message_id)
+            if system_message is None:
+                return None
+            system_tokens = get_system_message_tokens(system_message['content'])
+            messages.append({"role": "system", "content": system_message['content']})
+
+        budget = max(max_tokens - config['CONTEXT_RESPONSE_RESERVE_TOKENS'] - system_tokens, 0)
+
+        with _lock:
+            window = _windows.get(history_id)
+            if window is not None:
+                _windows.move_to_end(history_id)
+        # A bigger budget than the cached window was trimmed to needs older messages again.
+        if window is None or (budget > window.budget and not window.complete):
+            window = _load_window(history_id, budget)
+            if window is None:
+                return None
+            with _lock:
+                _cache_put(_windows, history_id, window)
+            log.debug("Context window loaded", history_id=history_id, messages=len(window.messages), tokens=window.total)
+        with window.lock:
+            if not _refresh_window(window, history_id, budget):
+                return None
+            messages.extend({"role": role, "content": content} for _, role, content, _ in window.messages)
+            history_tokens = window.total
+            truncated = not window.complete
+
+        token_count = system_tokens + history_tokens
+        log.debug("Context assembled", user_id=user_id, history_id=history_id, token_count=token_count, truncated=truncated)
+        return {"messages": messages, "token_count": token_count, "truncated": truncated}
+    except Exception as e:
+        log.error("Exception assembling chat context", user_id=user_id, history_id=history_id, error=str(e), exc_info=True)
+        return None
@@ -0,0 +1,323 @@
+# app/services/data_transfer_service.py
+import gzip
+import io
+import json
+import sys
+import zlib
+from datetime import date, datetime, timezone
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+
+from .db_service import get_backend, get_db, iter_db, query_db
+from .chat_service import CHAT_ROLES
+from .context_service import count_message_tokens
+from .system_message_service import EMBEDDING_OWNER_TYPE, embedding_text
+from app.utils.logging_config import get_logger
+
+log = get_logger(__name__)
+
+# Archive format: gzip-compressed NDJSON, one record per line, each with a
+# "type". A header comes first; parents always precede their children
+# (users, system messages, chat histories, chat messages). IDs are the
+# source database's and are remapped on import.
+ARCHIVE_VERSION = 1
+RECORD_TYPES = ('user', 'system_message', 'chat_history', 'chat_message')
+
+_CHUNK_SIZE = 64 * 1024
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat(sep=' ') # Same format as CURRENT_TIMESTAMP
+    if isinstance(value, date):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+_encoder = json.JSONEncoder(default=_json_default, separators=(',', ':'))
+_decoder = json.JSONDecoder()
+
+# Timestamps are read as text: they go straight into JSON, so parsing them into
+# datetimes (and formatting them back) would only cost time.
+def _ts(column):
+    return f"CAST({column} AS TEXT) AS {column}"
+
+
+# --- Export ---
+
+def export_records(user_id=None, include_password_hashes=True):
+    """Yields archive records straight from database cursors (all users, or one)."""
+    fetch_size = current_app.config['EXPORT_FETCH_SIZE']
+    user_filter = " WHERE id = ?" if user_id is not None else ""
+    owner_filter = " WHERE user_id = ?" if user_id is not None else ""
+    args = (user_id,) if user_id is not None else ()
+
+    yield {"type": "header", "version": ARCHIVE_VERSION, "exported_at": datetime.now(timezone.utc)}
+    for row in iter_db(f"SELECT id, username, password_hash, {_ts('created_at')}, {_ts('last_seen_at')} FROM users{user_filter} ORDER BY id", args, fetch_size):
+        record = {"type": "user", **dict(row)}
+        if not include_password_hashes:
+            del record['password_hash']
+        yield record
+    for row in iter_db(f"SELECT id, user_id, name, content, {_ts('created_at')} FROM system_messages{owner_filter} ORDER BY id", args, fetch_size):
+        yield {"type": "system_message", **dict(row)}
+    for row in iter_db(f"SELECT id, user_id, title, {_ts('created_at')} FROM chat_histories{owner_filter} ORDER BY id", args, fetch_size):
+        yield {"type": "chat_history", **dict(row)}
+    history_filter = " WHERE history_id IN (SELECT id FROM chat_histories WHERE user_id = ?)" if user_id is not None else ""
+    for row in iter_db(f"SELECT id, history_id, role, content, token_count, {_ts('created_at')} FROM chat_messages{history_filter} ORDER BY id", args, fetch_size):
+        yield {"type": "chat_message", **dict(row)}
+
+def export_archive(user_id=None, include_password_hashes=True):
+    """Yields the gzip-compressed NDJSON archive, compressing ~64 KiB of lines at a time."""
+    compressor = zlib.compressobj(current_app.config['EXPORT_COMPRESSION_LEVEL'], zlib.DEFLATED, 31) # 31 = gzip container
+    lines = []
+    lines_size = 0
+    count = 0
+    for record in export_records(user_id, include_password_hashes):
+        line = _encoder.encode(record).encode('utf-8') + b'\n'
+        lines.append(line)
+        lines_size += len(line)
+        count += 1
+        if lines_size >= _CHUNK_SIZE:
+            chunk = compressor.compress(b''.join(lines))
+            lines, lines_size = [], 0
+            if chunk:
+                yield chunk
+    yield compressor.compress(b''.join(lines)) + compressor.flush()
+    log.info("Data export finished", user_id=user_id, records=count)
+
+
+# --- Import ---
+
+class _Importer:
+    """Writes archive records in batched transactions, remapping IDs as it goes.
+
+    Memory use is constant apart from the old->new ID maps for users and chat
+    histories (child rows are never held beyond the current batch).
+    """
+
+    def __init__(self, batch_size, target_user_id=None):
+        self.db = get_db()
+        self.batch_size = batch_size
+        self.target_user_id = target_user_id
+        self.user_map = {}
+        self.history_map = {}
+        self.existing_names = None
+        self.existing_histories = None # (title, created_at) -> id, for target_user_id imports
+        self.skip_messages = {} # history_id -> messages already stored from an earlier import
+        self.pending_messages = [] # chat_messages rows for executemany
+        self.pending_embeddings = [] # (user_id, system_message_id, text)
+        self.in_batch = 0
+        self.counts = {record_type: 0 for record_type in RECORD_TYPES}
+        self.counts["skipped"] = 0
+        self.header_seen = False
+        self.handlers = {record_type: getattr(self, f"_add_{record_type}") for record_type in RECORD_TYPES}
+
+    def add(self, record):
+        if not isinstance(record, dict):
+            raise ValueError("Record is not a JSON object")
+        record_type = record.get('type')
+        if record_type == 'header':
+            if record.get('version') != ARCHIVE_VERSION:
+                raise ValueError(f"Unsupported archive version: {record.get('version')!r}")
+            self.header_seen = True
+            return
+        if not self.header_seen:
+            raise ValueError("Archive header missing")
+        handler = self.handlers.get(record_type)
+        if handler is None:
+            raise ValueError(f"Unknown record type: {record_type!r}")
+        imported = handler(record)
+        if imported:
+            self.counts[record_type] += 1
+        elif imported is False:
+            self.counts["skipped"] += 1
+        # None: only used for ID mapping, neither imported nor skipped
+        self.in_batch += 1
+        if self.in_batch >= self.batch_size:
+            self.commit()
+
+    def _add_user(self, record):
+        if self.target_user_id is not None:
+            # Importing into an existing account: everything belongs to it, so
+            # an archive of several users (e.g. from 'flask export-data') can't be merged.
+            if self.user_map and record['id'] not in self.user_map:
+                raise ValueError("archive contains more than one user")
+            self.user_map[record['id']] = self.target_user_id
+            return None
+        if not record.get('password_hash'):
+            log.warning("Skipping imported user without password hash", username=record.get('username'))
+            return False
+        existing = self.db.execute("SELECT id FROM users WHERE username = ?", (record['username'],)).fetchone()
+        if existing:
+            log.warning("Skipping imported user, username already exists", username=record['username'])
+            return False
+        cur = self.db.execute(
+            "INSERT INTO users (username, password_hash, created_at, last_seen_at) VALUES (?, ?, COALESCE(?, CURRENT_TIMESTAMP), ?)",
+            (record['username'], record['password_hash'], record.get('created_at'), record.get('last_seen_at'))
+        )
+        self.user_map[record['id']] = cur.lastrowid
+        return True
+
+    def _add_system_message(self, record):
+        user_id = self.user_map.get(record['user_id'])
+        if user_id is None:
+            return False
+        if self.target_user_id is not None:
+            # Same rule as the API: names are unique per user.
+            if self.existing_names is None:
+                rows = self.db.execute("SELECT name FROM system_messages WHERE user_id = ?", (user_id,)).fetchall()
+                self.existing_names = {row['name'] for row in rows}
+            if record['name'] in self.existing_names:
+                return False
+            self.existing_names.add(record['name'])
+        cur = self.db.execute(
+            "INSERT INTO system_messages (user_id, name, content, created_at) VALUES (?, ?, ?, COALESCE(?, CURRENT_TIMESTAMP))",
+            (user_id, record['name'], record['content'], record.get('created_at'))
+        )
+        self.pending_embeddings.append((user_id, cur.lastrowid, embedding_text(record['name'], record['content'])))
+        return True
+
+    def _add_chat_history(self, record):
+        user_id = self.user_map.get(record['user_id'])
+        if user_id is None:
+            return False
+        if self.target_user_id is not None:
+            # Histories are matched on title and creation time, so running the same
+            # restore again (or after a failed one) doesn't duplicate conversations.
+            if self.existing_histories is None:
+                rows = self.db.execute(f"SELECT id, title, {_ts('created_at')} FROM chat_histories WHERE user_id = ?", (user_id,)).fetchall()
+                self.existing_histories = {(row['title'], row['created_at']): row['id'] for row in rows}
+            existing_id = self.existing_histories.get((record['title'], record.get('created_at')))
+            if existing_id is not None:
+                # Messages are imported in order, so the stored ones are a prefix of the archive's
+                stored = self.db.execute("SELECT COUNT(*) AS n FROM chat_messages WHERE history_id = ?", (existing_id,)).fetchone()['n']
+                self.history_map[record['id']] = existing_id
+                self.skip_messages[existing_id] = stored
+                return False
+        cur = self.db.execute(
+            "INSERT INTO chat_histories (user_id, title, created_at) VALUES (?, ?, COALESCE(?, CURRENT_TIMESTAMP))",
+            (user_id, record['title'], record.get('created_at'))
+        )
+        self.history_map[record['id']] = cur.lastrowid
+        return True
+
+    def _add_chat_message(self, record):
+        history_id = self.history_map.get(record['history_id'])
+        if history_id is None:
+            return False
+        if record['role'] not in CHAT_ROLES:
+            # Same rule as chat_service.add_chat_message
+            log.warning("Skipping imported chat message with invalid role", role=record['role'])
+            return False
+        if self.skip_messages.get(history_id):
+            self.skip_messages[history_id] -= 1
+            return False
+        token_count = record.get('token_count')
+        if not isinstance(token_count, int) or token_count < 0:
+            token_count = count_message_tokens(record['content'])
+        self.pending_messages.append((history_id, record['role'], record['content'], token_count, record.get('created_at')))
+        return True
+
+    def commit(self):
+        """Writes the buffered rows and commits the current batch."""
+        if self.pending_messages:
+            self.db.executemany(
+                "INSERT INTO chat_messages (history_id, role, content, token_count, created_at) VALUES (?, ?, ?, ?, COALESCE(?, CURRENT_TIMESTAMP))",
+                self.pending_messages
+            )
+            self.pending_messages = []
+        if self.pending_embeddings:
+            from . import embedding_service # Deferred: loads numpy
+            embedding_service.index_many(EMBEDDING_OWNER_TYPE, self.pending_embeddings)
+            self.pending_embeddings = []
+        self.db.commit()
+        log.debug("Import batch committed", records=self.in_batch)
+        self.in_batch = 0
+
+    def rollback(self):
+        self.pending_messages = []
+        self.pending_embeddings = []
+        self.db.rollback()
+
+
+def import_archive(fileobj, target_user_id=None):
+    """Imports a gzip-compressed NDJSON archive from a binary file object.
+
+    With target_user_id, everything is imported into that existing account: the
+    archive must hold a single user, whose record only serves for ID mapping
+    and is not counted. System messages whose name already exists and chat
+    histories already present (same title and created_at) are skipped; a
+    history only gets the messages it is missing, so importing the same archive
+    again, or after a failure, completes it without duplicates.
+    Returns (counts, message); counts is None on failure. Batches committed
+    before a failure are kept.
+    """
+    importer = _Importer(current_app.config['IMPORT_BATCH_SIZE'], target_user_id)
+    line_no = 0
+    try:
+        with io.TextIOWrapper(gzip.GzipFile(fileobj=fileobj, mode='rb'), encoding='utf-8') as archive:
+            for line_no, line in enumerate(archive, 1):
+                if not line.strip():
+                    continue
+                importer.add(_decoder.decode(line))
+        importer.commit()
+        log.info("Data import finished", target_user_id=target_user_id, **importer.counts)
+        return importer.counts, "Import completed successfully."
+    except (ValueError, KeyError, TypeError, AttributeError, OSError, EOFError, zlib.error) as e:
+        # Bad JSON, missing or wrongly typed fields, or a corrupt/truncated gzip stream
+        importer.rollback()
+        log.warning("Data import rejected", line=line_no, error=str(e))
+        return None, f"Invalid archive at line {line_no}: {e}"
+    except get_backend().Error as e:
+        importer.rollback()
+        log.error("Database error during data import", line=line_no, error=str(e))
+        return None, "A database error occurred during import."
+
+
+# --- CLI ---
+
+@click.command('export-data')
+@click.argument('output', type=click.Path(dir_okay=False, allow_dash=True))
+@click.option('--user', 'username', help='Only export this user.')
+@with_appcontext
+def export_data_command(output, username):
+    """Export users, system messages and chat history as .ndjson.gz ('-' for stdout)."""
+    user_id = None
+    if username:
+        user = query_db("SELECT id FROM users WHERE username = ?", (username,), one=True)
+        if user is None:
+            click.echo(f'User not found: {username}', err=True)
+            return
+        user_id = user['id']
+    out = sys.stdout.buffer if output == '-' else open(output, 'wb')
+    try:
+        for chunk in export_archive(user_id):
+            out.write(chunk)
+    finally:
+        if out is not sys.stdout.buffer:
+            out.close()
+    if output != '-':
+        click.echo(f'Exported data to {output}.')
+
+@click.command('import-data')
+@click.argument('input', type=click.Path(exists=True, dir_okay=False, allow_dash=True))
+@with_appcontext
+def import_data_command(input):
+    """Import a .ndjson.gz archive created by export-data ('-' for stdin)."""
+    src = sys.stdin.buffer if input == '-' else open(input, 'rb')
+    try:
+        counts, message = import_archive(src)
+    finally:
+        if src is not sys.stdin.buffer:
+            src.close()
+    if counts is None:
+        click.echo(f'Error importing data: {message}', err=True)
+        return
+    click.echo(f"Imported {counts['user']} users, {counts['system_message']} system messages, "
+               f"{counts['chat_history']} chat histories, {counts['chat_message']} chat messages "
+               f"({counts['skipped']} records skipped).")
+
+
+def init_app(app):
+    """Register the export/import CLI commands with the Flask app."""
+    app.cli.add_command(export_data_command) # 'flask export-data'
+    app.cli.add_command(import_data_command) # 'flask import-data'
@@ -0,0 +1,249 @@
+# app/services/db_backends.py
+import functools
+import os
+import sqlite3
+import uuid
+from urllib.parse import urlsplit
+
+from app.utils.logging_config import get_logger
+from app.utils.process_local import ProcessLocal
+
+log = get_logger(__name__)
+
+# Backends expose connections with the sqlite3-style API the services already
+# use: execute(query, args) -> cursor (fetchall/fetchone/lastrowid/close),
+# executescript, commit, rollback, close, and `with conn:` as a transaction.
+# Queries are always written with '?' placeholders.
+
+class SqliteBackend:
+    """Default backend: one sqlite3 connection per request, no pooling needed."""
+    name = 'sqlite'
+    schema_file = 'schema.sql'
+    supports_snapshots = True
+    Error = sqlite3.Error
+
+    def __init__(self, database_url):
+        self.database_url = database_url
+        self.path = database_url.replace('sqlite:///', '')
+
+    def connect(self):
+        # Ensure the directory exists if the path is not :memory:
+        if self.path != ':memory:':
+             os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        db = sqlite3.connect(
+            self.path,
+            detect_types=sqlite3.PARSE_DECLTYPES
+        )
+        db.row_factory = sqlite3.Row # Access columns by name
+        return db
+
+    def acquire(self):
+        return self.connect()
+
+    def release(self, db):
+        db.close()
+
+    def stream(self, db, query, args=(), size=1000):
+        """Yields rows of a query without materializing the whole result."""
+        cur = db.execute(query, args)
+        try:
+            while True:
+                rows = cur.fetchmany(size)
+                if not rows:
+                    break
+                yield from rows
+        finally:
+            cur.close()
+
+
+@functools.lru_cache(maxsize=1024)
+def translate_query(query):
+    """Rewrites a '?'-style query for psycopg ('%s'), leaving string literals alone.
+
+    Returns (query, needs_returning): INSERTs without a RETURNING clause get
+    'RETURNING id' appended so insert_db can still report the new row ID.
+    """
+    out = []
+    in_literal = False
+    for ch in query:
+        if ch == "'":
+            in_literal = not in_literal
+            out.append(ch)
+        elif ch == '%':
+            out.append('%%') # psycopg treats every bare % as a placeholder
+        elif ch == '?' and not in_literal:
+            out.append('%s')
+        else:
+            out.append(ch)
+    translated = ''.join(out)
+
+    stripped = query.lstrip().upper()
+    needs_returning = stripped.startswith('INSERT') and 'RETURNING' not in stripped
+    if needs_returning:
+        translated = translated.rstrip().rstrip(';') + ' RETURNING id'
+    return translated, needs_returning
+
+
+class PostgresCursor:
+    """Wraps a psycopg cursor to provide sqlite3's lastrowid."""
+
+    def __init__(self, cursor, needs_returning):
+        self._cursor = cursor
+        self.lastrowid = None
+        if needs_returning:
+            row = cursor.fetchone()
+            self.lastrowid = row['id'] if row else None
+
+    def fetchall(self):
+        if self.lastrowid is not None or self._cursor.description is None:
+            return []
+        return self._cursor.fetchall()
+
+    def fetchone(self):
+        if self.lastrowid is not None or self._cursor.description is None:
+            return None
+        return self._cursor.fetchone()
+
+    def fetchmany(self, size):
+        if self.lastrowid is not None or self._cursor.description is None:
+            return []
+        return self._cursor.fetchmany(size)
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    def close(self):
+        self._cursor.close()
+
+
+class PostgresConnection:
+    """sqlite3-compatible facade over a psycopg connection."""
+
+    def __init__(self, conn, on_close=None):
+        self._conn = conn
+        self._on_close = on_close
+
+    def execute(self, query, args=()):
+        translated, needs_returning = translate_query(query)
+        cur = self._conn.cursor()
+        cur.execute(translated, tuple(args))
+        return PostgresCursor(cur, needs_returning)
+
+    def executemany(self, query, seq_of_args):
+        translated, _ = translate_query(query)
+        translated = translated[:-len(' RETURNING id')] if translated.endswith(' RETURNING id') else translated
+        cur = self._conn.cursor()
+        cur.executemany(translated, [tuple(args) for args in seq_of_args])
+        return PostgresCursor(cur, False)
+
+    def stream(self, query, args=(), size=1000):
+        """Yields rows through a server-side cursor, fetching `size` rows per round trip."""
+        translated, _ = translate_query(query)
+        with self._conn.cursor(name=f"stream_{uuid.uuid4().hex}") as cur:
+            cur.itersize = size
+            cur.execute(translated, tuple(args))
+            yield from cur
+
+    def executescript(self, script):
+        with self._conn.cursor() as cur:
+            cur.execute(script, prepare=False) # Multiple statements need the simple query protocol
+
+    def commit(self):
+        self._conn.commit()
+
+    def rollback(self):
+        self._conn.rollback()
+
+    def close(self):
+        if self._on_close is not None:
+            self._on_close(self._conn)
+        else:
+            self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # Same semantics as sqlite3: commit or roll back, but keep the connection open.
+        if exc_type is None:
+            self.commit()
+        else:
+            self.rollback()
+        return False
+
+
+class PostgresBackend:
+    """PostgreSQL via psycopg 3 with a per-process connection pool.
+
+    psycopg prepares a statement server-side once it has been executed
+    DATABASE_PREPARE_THRESHOLD times on a connection, so hot queries skip
+    parsing and planning; translated query strings are cached as well.
+    """
+    name = 'postgresql'
+    schema_file = 'schema_postgres.sql'
+    supports_snapshots = False
+
+    def __init__(self, database_url, pool_min_size=1, pool_max_size=10, prepare_threshold=5):
+        import psycopg # Deferred: only needed when Postgres is configured
+        self.Error = psycopg.Error
+        self.database_url = database_url
+        self.pool_min_size = pool_min_size
+        self.pool_max_size = pool_max_size
+        self.prepare_threshold = prepare_threshold
+        # Pools are per process: connections must never be shared across a fork.
+        self._pool = ProcessLocal(self._open_pool)
+
+    def _connect_kwargs(self):
+        from psycopg.rows import dict_row
+        return {"row_factory": dict_row, "prepare_threshold": self.prepare_threshold}
+
+    def connect(self):
+        """Opens a dedicated (unpooled) connection, e.g. for background writers."""
+        import psycopg
+        return PostgresConnection(psycopg.connect(self.database_url, **self._connect_kwargs()))
+
+    def _open_pool(self):
+        from psycopg_pool import ConnectionPool
+        pool = ConnectionPool(
+            self.database_url,
+            min_size=self.pool_min_size,
+            max_size=self.pool_max_size,
+            kwargs=self._connect_kwargs(),
+            open=True,
+        )
+        log.info("Database connection pool opened", min_size=self.pool_min_size, max_size=self.pool_max_size)
+        return pool
+
+    def acquire(self):
+        pool = self._pool.get()
+        return PostgresConnection(pool.getconn(), on_close=pool.putconn)
+
+    def release(self, db):
+        db.close() # Returns the connection to the pool
+
+    def stream(self, db, query, args=(), size=1000):
+        return db.stream(query, args, size)
+
+    def close_pool(self):
+        pool = self._pool.peek()
+        if pool is not None:
+            pool.close()
+        self._pool.reset()
+
+
+BACKENDS = {
+    'sqlite': SqliteBackend,
+    'postgresql': PostgresBackend,
+    'postgres': PostgresBackend,
+}
+
+def create_backend(database_url, **options):
+    """Builds the backend matching the URL scheme (sqlite:///..., postgresql://...)."""
+    scheme = urlsplit(database_url).scheme
+    backend_class = BACKENDS.get(scheme)
+    if backend_class is None:
+        raise ValueError(f"Unsupported DATABASE_URL scheme: {scheme!r}")
+    if backend_class is SqliteBackend:
+        return backend_class(database_url)
+    return backend_class(database_url, **options)
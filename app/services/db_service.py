@@ -1,52 +1,87 @@
 # app/services/db_service.py
 import sqlite3
+import threading
 import click
-from flask import current_app, g
+from flask import current_app, g, has_app_context
 from flask.cli import with_appcontext
 import os # Needed for schema path
 
+from .db_backends import create_backend
 # Import logger setup correctly
 from app.utils.logging_config import get_logger
 
 log = get_logger(__name__)
 
+_backends = {}
+_backends_lock = threading.Lock()
+
+def get_backend(database_url=None):
+    """Returns the (cached) backend for a DATABASE_URL, chosen by its scheme.
+
+    Defaults to the current app's DATABASE_URL; pool options are read from the
+    app config the first time a given URL is seen.
+    """
+    if database_url is None:
+        database_url = current_app.config['DATABASE_URL']
+    backend = _backends.get(database_url)
+    if backend is None:
+        with _backends_lock:
+            backend = _backends.get(database_url)
+            if backend is None:
+                options = {}
+                if has_app_context():
+                    options = {
+                        "pool_min_size": current_app.config['DATABASE_POOL_MIN_SIZE'],
+                        "pool_max_size": current_app.config['DATABASE_POOL_MAX_SIZE'],
+                        "prepare_threshold": current_app.config['DATABASE_PREPARE_THRESHOLD'],
+                    }
+                backend = create_backend(database_url, **options)
+                _backends[database_url] = backend
+                log.info("Database backend selected", backend=backend.name)
+    return backend
+
+def connect(database_url):
+    """Opens a new, unpooled connection to the given DATABASE_URL (not cached on g)."""
+    backend = get_backend(database_url)
+    try:
+        db = backend.connect()
+        log.debug("Database connection established", backend=backend.name)
+    except backend.Error as e:
+        log.error("Database connection failed", backend=backend.name, error=str(e))
+        raise # Re-raise the exception
+    return db
+
 def get_db():
     """Connects to the application's configured database. Caches connection per request."""
     if 'db' not in g:
-        db_path = current_app.config['DATABASE_URL'].replace('sqlite:///', '')
-        # Ensure the directory exists if the path is not :memory:
-        if db_path != ':memory:':
-             os.makedirs(os.path.dirname(db_path), exist_ok=True)
-
+        backend = get_backend()
         try:
-            g.db = sqlite3.connect(
-                db_path,
-                detect_types=sqlite3.PARSE_DECLTYPES
-            )
-            g.db.row_factory = sqlite3.Row # Access columns by name
-            log.debug("Database connection established", path=db_path)
-        except sqlite3.Error as e:
-            log.error("Database connection failed", path=db_path, error=str(e))
+            g.db = backend.acquire() # Pooled for backends that support it
+            log.debug("Database connection established", backend=backend.name)
+        except backend.Error as e:
+            log.error("Database connection failed", backend=backend.name, error=str(e))
             raise # Re-raise the exception
     return g.db
 
 def close_db(e=None):
-    """Closes the database connection at the end of the request."""
+    """Closes (or returns to the pool) the database connection at the end of the request."""
     db = g.pop('db', None)
     if db is not None:
+        backend = get_backend()
         try:
-            db.close()
+            backend.release(db)
             log.debug("Database connection closed.")
-        except sqlite3.Error as e:
+        except backend.Error as e:
             log.error("Error closing database connection", error=str(e))
 
 
 def init_db():
-    """Initializes the database schema from schema.sql."""
+    """Initializes the database schema from the backend's schema file (data/schema.sql for SQLite)."""
+    backend = get_backend()
     try:
         db = get_db()
-        # Correct path relative to the project root where schema.sql is located
-        schema_path = os.path.join(current_app.config['BASE_DIR'], 'data', 'schema.sql')
+        # Correct path relative to the project root where the schema files are located
+        schema_path = os.path.join(current_app.config['BASE_DIR'], 'data', backend.schema_file)
         log.info("Initializing database schema", path=schema_path)
 
         if not os.path.exists(schema_path):
@@ -57,7 +92,7 @@ def init_db():
             db.executescript(f.read())
         db.commit() # Commit schema changes
         log.info("Database schema initialized successfully.")
-    except sqlite3.Error as e:
+    except backend.Error as e:
         log.error("Error initializing database schema", error=str(e))
         if 'db' in locals() and db:
             db.rollback() # Rollback on error
@@ -67,6 +102,25 @@ def init_db():
         raise
 
 
+def supports_snapshots():
+    """True if snapshot_db/restore_db work with the configured backend (SQLite only)."""
+    return get_backend().supports_snapshots
+
+def snapshot_db():
+    """Copies the current database into a new in-memory connection (SQLite backup API)."""
+    if not supports_snapshots():
+        raise NotImplementedError(f"Snapshots are not supported by the {get_backend().name} backend")
+    snapshot = sqlite3.connect(':memory:')
+    get_db().backup(snapshot)
+    log.debug("Database snapshot taken")
+    return snapshot
+
+def restore_db(snapshot):
+    """Overwrites the current database with the contents of a snapshot."""
+    snapshot.backup(get_db())
+    log.debug("Database restored from snapshot")
+
+
 # Command to initialize the database from Flask CLI
 @click.command('init-db')
 @with_appcontext # Ensures app context is available
@@ -98,13 +152,22 @@ def query_db(query, args=(), one=False):
         cur.close()
         db.commit() # Commit changes after successful execution (for INSERT/UPDATE/DELETE)
         return (rv[0] if rv else None) if one else rv
-    except sqlite3.Error as e:
+    except get_backend().Error as e:
         log.error("Database query failed", query=query, error=str(e))
         db.rollback() # Rollback on error
         # Depending on your error handling strategy, you might return None,
         # an empty list, or re-raise a custom exception
         return None # Example: return None on error
 
+def iter_db(query, args=(), size=1000):
+    """Yields the rows of a SELECT one at a time, fetching `size` rows per round trip.
+
+    Unlike query_db the result is never held in memory as a whole, and nothing
+    is committed; use it for exports and other large scans.
+    """
+    backend = get_backend()
+    yield from backend.stream(get_db(), query, args, size)
+
 def insert_db(query, args=()):
     """Helper function for INSERT queries, returns last row ID."""
     db = get_db()
@@ -114,7 +177,7 @@ def insert_db(query, args=()):
         cur.close()
         db.commit()
         return last_id
-    except sqlite3.Error as e:
+    except get_backend().Error as e:
         log.error("Database insert failed", query=query, error=str(e))
         db.rollback()
         return None
\ No newline at end of file
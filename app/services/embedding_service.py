@@ -0,0 +1,279 @@
+# app/services/embedding_service.py
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+from flask import current_app
+
+from app.extensions import LazyClient
+from .db_service import get_db, query_db, insert_db
+from app.utils.logging_config import get_logger
+
+log = get_logger(__name__)
+
+# --- Embedders ---
+# An embedder turns texts into an (n, dim) float32 array of L2-normalized rows.
+
+def _normalize(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (matrix / norms).astype(np.float32, copy=False)
+
+class HashingEmbedder:
+    """Local, deterministic embedder: signed feature hashing of words and character trigrams.
+
+    No model or network needed; similar wording gives similar vectors, which is
+    enough for tests and offline development.
+    """
+    _WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+    def __init__(self, dim=256):
+        self.dim = dim
+        self.name = f"hashing-{dim}"
+
+    def _features(self, text):
+        for word in self._WORD_RE.findall(text.lower()):
+            yield word
+            padded = f"#{word}#"
+            for i in range(len(padded) - 2):
+                yield padded[i:i + 3]
+
+    def embed_many(self, texts):
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature in self._features(text):
+                # blake2b rather than hash(): must be stable across processes
+                h = int.from_bytes(hashlib.blake2b(feature.encode('utf-8'), digest_size=8).digest(), 'little')
+                out[row, h % self.dim] += 1.0 if h >> 63 else -1.0
+        return _normalize(out)
+
+    def embed(self, text):
+        return self.embed_many([text])[0]
+
+
+class _EmbeddingResponse(list):
+    """Vectors plus the response headers, so the provider gateway can pace calls."""
+    def __init__(self, vectors, headers):
+        super().__init__(vectors)
+        self.headers = headers
+
+class OpenAIEmbedder:
+    """Embeddings from the OpenAI API, sent through the provider gateway.
+
+    Single embed() calls from concurrent requests are merged into
+    multi-input requests by an EmbeddingBatcher.
+    """
+
+    def __init__(self, model, batch_size=64, batch_wait=0.01):
+        from app.extensions import openai_client
+        from .provider_gateway import EmbeddingBatcher, get_gateway
+        self.name = f"openai-{model}"
+        self.model = model
+        client = openai_client.get()
+
+        def embed_request(texts):
+            raw = client.embeddings.with_raw_response.create(model=model, input=texts)
+            return _EmbeddingResponse([item.embedding for item in raw.parse().data], raw.headers)
+
+        self._batcher = EmbeddingBatcher(get_gateway('openai'), embed_request, batch_size, batch_wait)
+
+    def embed_many(self, texts):
+        return _normalize(np.asarray(self._batcher.embed_many(list(texts)), dtype=np.float32))
+
+    def embed(self, text):
+        return _normalize(np.asarray([self._batcher.embed(text)], dtype=np.float32))[0]
+
+
+def _make_embedder(config):
+    backend = config['EMBEDDING_BACKEND']
+    if backend == 'hashing':
+        embedder = HashingEmbedder(config['EMBEDDING_HASHING_DIM'])
+    elif backend == 'openai':
+        embedder = OpenAIEmbedder(config['EMBEDDING_MODEL'], config['EMBEDDING_BATCH_SIZE'], config['EMBEDDING_BATCH_WAIT'])
+    else:
+        raise ValueError(f"Unknown EMBEDDING_BACKEND: {backend!r}")
+    log.info("Embedder initialized", embedder=embedder.name)
+    return embedder
+
+_embedder = LazyClient('embedder', _make_embedder)
+
+def get_embedder():
+    """Returns this process's embedder, built from EMBEDDING_BACKEND on first use."""
+    return _embedder.get()
+
+
+# --- Vector search ---
+
+class _IVFIndex:
+    """Approximate index: vectors bucketed by nearest of ~sqrt(n) centroids (spherical k-means)."""
+
+    def __init__(self, matrix, iterations=5, seed=0):
+        n = matrix.shape[0]
+        nlist = max(1, int(np.sqrt(n)))
+        rng = np.random.default_rng(seed)
+        centroids = matrix[rng.choice(n, size=nlist, replace=False)].copy()
+        for _ in range(iterations):
+            assignment = np.argmax(matrix @ centroids.T, axis=1)
+            for c in range(nlist):
+                members = matrix[assignment == c]
+                if len(members):
+                    centroids[c] = members.mean(axis=0)
+            centroids = _normalize(centroids)
+        assignment = np.argmax(matrix @ centroids.T, axis=1)
+        self.centroids = centroids
+        self.lists = [np.flatnonzero(assignment == c) for c in range(nlist)]
+
+    def candidates(self, query, probes):
+        probes = min(probes, len(self.lists))
+        nearest = np.argpartition(-(self.centroids @ query), probes - 1)[:probes]
+        return np.concatenate([self.lists[c] for c in nearest])
+
+
+def _top_k(scores, k):
+    """Indices of the k highest scores, best first."""
+    if k < len(scores):
+        idx = np.argpartition(-scores, k - 1)[:k]
+    else:
+        idx = np.arange(len(scores))
+    return idx[np.argsort(-scores[idx], kind='stable')]
+
+class _Shard:
+    """All vectors of one user and owner type, as one contiguous float32 matrix.
+
+    `version` is the user's embeddings_version when the rows were read.
+    """
+
+    def __init__(self, owner_ids, matrix, ann_threshold, version=0):
+        self.owner_ids = owner_ids
+        self.matrix = matrix
+        self.version = version
+        self.loaded_at = time.monotonic()
+        self.ivf = _IVFIndex(matrix) if len(owner_ids) >= ann_threshold else None
+
+    def search(self, query, k, probes):
+        if len(self.owner_ids) == 0:
+            return []
+        if self.ivf is not None:
+            candidates = self.ivf.candidates(query, probes)
+            if len(candidates) >= k:
+                scores = self.matrix[candidates] @ query
+                best = candidates[_top_k(scores, k)]
+                return [(int(self.owner_ids[i]), float(self.matrix[i] @ query)) for i in best]
+        scores = self.matrix @ query
+        return [(int(self.owner_ids[i]), float(scores[i])) for i in _top_k(scores, k)]
+
+
+_shards = OrderedDict() # (user_id, owner_type, model) -> _Shard
+_shards_lock = threading.Lock()
+
+# Every write or delete bumps users.embeddings_version after its rows are
+# committed. Shards are cached per process, so each search compares the
+# version (a primary-key lookup) to catch changes made by other workers.
+_BUMP_VERSION = "UPDATE users SET embeddings_version = embeddings_version + 1 WHERE id = ?"
+
+def _current_version(user_id):
+    row = query_db("SELECT embeddings_version FROM users WHERE id = ?", (user_id,), one=True)
+    return row['embeddings_version'] if row else 0
+
+def _load_shard(user_id, owner_type, model, version):
+    rows = query_db(
+        "SELECT owner_id, vector FROM embeddings WHERE user_id = ? AND owner_type = ? AND model = ? ORDER BY owner_id",
+        (user_id, owner_type, model)
+    )
+    if rows is None:
+        return None
+    owner_ids = np.fromiter((row['owner_id'] for row in rows), dtype=np.int64, count=len(rows))
+    if rows:
+        matrix = np.vstack([np.frombuffer(row['vector'], dtype=np.float32) for row in rows])
+    else:
+        matrix = np.zeros((0, 0), dtype=np.float32)
+    return _Shard(owner_ids, matrix, current_app.config['EMBEDDING_ANN_THRESHOLD'], version)
+
+def _get_shard(user_id, owner_type, model):
+    key = (user_id, owner_type, model)
+    ttl = current_app.config['EMBEDDING_SHARD_TTL']
+    # Read before the rows: a write racing the load then just forces another reload.
+    version = _current_version(user_id)
+    with _shards_lock:
+        shard = _shards.get(key)
+        if shard is not None and shard.version == version and time.monotonic() - shard.loaded_at < ttl:
+            _shards.move_to_end(key)
+            return shard
+    shard = _load_shard(user_id, owner_type, model, version)
+    if shard is None:
+        return None
+    with _shards_lock:
+        _shards[key] = shard
+        _shards.move_to_end(key)
+        while len(_shards) > current_app.config['EMBEDDING_MAX_SHARDS']:
+            _shards.popitem(last=False)
+    log.debug("Embedding shard loaded", user_id=user_id, owner_type=owner_type, size=len(shard.owner_ids))
+    return shard
+
+def _invalidate(user_id, owner_type):
+    with _shards_lock:
+        for key in [key for key in _shards if key[:2] == (user_id, owner_type)]:
+            del _shards[key]
+
+def clear_shards():
+    """Drops all in-memory shards."""
+    with _shards_lock:
+        _shards.clear()
+
+
+# --- Public API ---
+
+def index_text(user_id, owner_type, owner_id, text):
+    """Embeds text and stores it for (owner_type, owner_id), replacing any previous vector."""
+    embedder = get_embedder()
+    vector = np.ascontiguousarray(embedder.embed(text), dtype=np.float32)
+    row_id = insert_db(
+        "INSERT INTO embeddings (user_id, owner_type, owner_id, model, vector) VALUES (?, ?, ?, ?, ?) "
+        "ON CONFLICT (owner_type, owner_id) DO UPDATE SET "
+        "user_id = excluded.user_id, model = excluded.model, vector = excluded.vector, updated_at = CURRENT_TIMESTAMP",
+        (user_id, owner_type, owner_id, embedder.name, vector.tobytes())
+    )
+    if row_id is None:
+        log.error("Storing embedding failed", user_id=user_id, owner_type=owner_type, owner_id=owner_id)
+        return False
+    query_db(_BUMP_VERSION, (user_id,))
+    _invalidate(user_id, owner_type)
+    return True
+
+def index_many(owner_type, items):
+    """Embeds and stores many (user_id, owner_id, text) items in one pass, for bulk loads.
+
+    Runs on the current connection without committing; the caller commits.
+    """
+    if not items:
+        return
+    embedder = get_embedder()
+    vectors = embedder.embed_many([text for _, _, text in items])
+    get_db().executemany(
+        "INSERT INTO embeddings (user_id, owner_type, owner_id, model, vector) VALUES (?, ?, ?, ?, ?) "
+        "ON CONFLICT (owner_type, owner_id) DO UPDATE SET "
+        "user_id = excluded.user_id, model = excluded.model, vector = excluded.vector, updated_at = CURRENT_TIMESTAMP",
+        [(user_id, owner_type, owner_id, embedder.name, np.ascontiguousarray(vector, dtype=np.float32).tobytes())
+         for (user_id, owner_id, _), vector in zip(items, vectors)]
+    )
+    user_ids = {user_id for user_id, _, _ in items}
+    get_db().executemany(_BUMP_VERSION, [(user_id,) for user_id in user_ids])
+    for user_id in user_ids:
+        _invalidate(user_id, owner_type)
+
+def remove(user_id, owner_type, owner_id):
+    """Deletes the stored vector for (owner_type, owner_id)."""
+    query_db("DELETE FROM embeddings WHERE owner_type = ? AND owner_id = ? AND user_id = ?", (owner_type, owner_id, user_id))
+    query_db(_BUMP_VERSION, (user_id,))
+    _invalidate(user_id, owner_type)
+
+def search(user_id, owner_type, text, k=5):
+    """Returns up to k (owner_id, score) pairs most similar to text, best first (cosine similarity)."""
+    embedder = get_embedder()
+    shard = _get_shard(user_id, owner_type, embedder.name)
+    if shard is None:
+        return None
+    query = np.ascontiguousarray(embedder.embed(text), dtype=np.float32)
+    return shard.search(query, k, current_app.config['EMBEDDING_ANN_PROBES'])
@@ -0,0 +1,274 @@
+# app/services/provider_gateway.py
+import random
+import re
+import threading
+import time
+from concurrent.futures import Future
+from flask import current_app
+
+from app.utils.logging_config import get_logger
+from app.utils.process_local import ProcessLocal
+
+log = get_logger(__name__)
+
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+# SDK exception class names that mean "never reached the provider / timed out"
+_CONNECTION_ERROR_NAMES = {'APIConnectionError', 'APITimeoutError', 'ConnectError', 'ReadTimeout', 'ConnectTimeout'}
+
+_DURATION_RE = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+_DURATION_UNITS = {'ms': 0.001, 's': 1, 'm': 60, 'h': 3600}
+
+def parse_duration(value):
+    """Parses rate-limit durations like '20ms', '1.5s', '6m0s' or plain seconds. Returns seconds or None."""
+    if value is None:
+        return None
+    value = str(value).strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION_RE.findall(value)
+    if not parts:
+        return None
+    return sum(float(amount) * _DURATION_UNITS[unit] for amount, unit in parts)
+
+def _header(headers, name):
+    if not headers:
+        return None
+    value = headers.get(name)
+    if value is None:
+        value = headers.get(name.lower())
+    return value
+
+def classify_error(exc):
+    """Returns (retryable, status_code, headers) for an SDK exception (openai or google-genai)."""
+    status = getattr(exc, 'status_code', None)
+    if not isinstance(status, int):
+        status = getattr(exc, 'code', None) # google-genai APIError
+    response = getattr(exc, 'response', None)
+    headers = getattr(response, 'headers', None)
+    if isinstance(status, int):
+        return status in RETRYABLE_STATUS_CODES, status, headers
+    if isinstance(exc, (ConnectionError, TimeoutError)) or any(
+            cls.__name__ in _CONNECTION_ERROR_NAMES for cls in type(exc).__mro__):
+        return True, None, headers
+    return False, None, headers
+
+
+class AdaptiveRateLimiter:
+    """Client-side pacing driven by the provider's rate-limit headers.
+
+    A 429 (or remaining == 0) blocks new calls until the advertised reset /
+    retry-after; when the remaining budget runs low, calls are spaced out over
+    the reset window instead of being sent as a burst. Each wait() reserves
+    its own slot, so concurrent callers are released one interval apart.
+    """
+
+    def __init__(self, low_watermark=5):
+        self.low_watermark = low_watermark
+        self._next_allowed = 0.0
+        self._interval = 0.0 # Minimum spacing between calls; 0 while the budget is healthy
+        self._lock = threading.Lock()
+
+    def wait(self):
+        """Sleeps until this caller's slot; returns the time slept."""
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_allowed)
+            self._next_allowed = slot + self._interval
+        delay = slot - now
+        if delay > 0:
+            time.sleep(delay)
+        return delay
+
+    def _push_back(self, seconds):
+        with self._lock:
+            self._next_allowed = max(self._next_allowed, time.monotonic() + seconds)
+
+    def update(self, headers):
+        """Adjusts pacing from x-ratelimit-remaining-*/x-ratelimit-reset-* headers.
+
+        Returns the block (budget exhausted) or spacing (budget low) applied.
+        Headers without a low budget clear the spacing.
+        """
+        block = 0.0
+        interval = 0.0
+        for kind in ('requests', 'tokens'):
+            remaining = _header(headers, f'x-ratelimit-remaining-{kind}')
+            reset = parse_duration(_header(headers, f'x-ratelimit-reset-{kind}'))
+            if remaining is None or reset is None:
+                continue
+            try:
+                remaining = int(remaining)
+            except ValueError:
+                continue
+            if remaining <= 0:
+                block = max(block, reset)
+            elif kind == 'requests' and remaining < self.low_watermark:
+                interval = max(interval, reset / remaining)
+        with self._lock:
+            self._interval = interval
+        if block:
+            self._push_back(block)
+        return max(block, interval)
+
+    def penalize(self, retry_after):
+        """Blocks new calls for retry_after seconds (after a 429).
+
+        Calls then resume spaced retry_after / low_watermark apart, rather than
+        all at once, until a successful response resets the pacing.
+        """
+        self._push_back(retry_after)
+        with self._lock:
+            self._interval = max(self._interval, retry_after / self.low_watermark)
+
+
+class ProviderGateway:
+    """Single choke point for calls to one LLM provider from this process.
+
+    Bounds in-flight calls with a semaphore, paces them with an
+    AdaptiveRateLimiter, and retries retryable failures with full-jitter
+    exponential backoff (honouring retry-after).
+    """
+
+    def __init__(self, name, max_concurrency=4, max_retries=5, backoff_base=0.5, backoff_max=30.0):
+        self.name = name
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.limiter = AdaptiveRateLimiter()
+        self._semaphore = threading.BoundedSemaphore(max_concurrency)
+        self._stats_lock = threading.Lock()
+        self._stats = {"calls": 0, "retries": 0, "rate_limited": 0, "failures": 0}
+
+    def _bump(self, key):
+        with self._stats_lock:
+            self._stats[key] += 1
+
+    def stats(self):
+        with self._stats_lock:
+            return dict(self._stats)
+
+    def backoff(self, attempt, retry_after=None):
+        """Full-jitter backoff for the given retry attempt, never shorter than retry_after."""
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        return delay
+
+    def call(self, fn, *args, **kwargs):
+        """Calls fn(*args, **kwargs) under the gateway's limits, retrying retryable errors.
+
+        If the result has `headers` (e.g. an openai `with_raw_response` call),
+        they feed the rate limiter.
+        """
+        attempt = 0
+        while True:
+            self.limiter.wait()
+            self._bump("calls")
+            try:
+                with self._semaphore:
+                    result = fn(*args, **kwargs)
+            except Exception as e:
+                retryable, status, headers = classify_error(e)
+                if status == 429:
+                    self._bump("rate_limited")
+                if not retryable or attempt >= self.max_retries:
+                    self._bump("failures")
+                    log.error("Provider call failed", provider=self.name, status=status, attempts=attempt + 1, error=str(e))
+                    raise
+                retry_after = parse_duration(_header(headers, 'retry-after'))
+                if headers:
+                    self.limiter.update(headers)
+                if retry_after is not None:
+                    self.limiter.penalize(retry_after)
+                delay = self.backoff(attempt, retry_after)
+                attempt += 1
+                self._bump("retries")
+                log.warning("Provider call failed, retrying", provider=self.name, status=status,
+                            attempt=attempt, delay=round(delay, 3))
+                time.sleep(delay) # Semaphore is released while backing off
+                continue
+            # Also called without headers, so penalty spacing ends on success
+            self.limiter.update(getattr(result, 'headers', None))
+            return result
+
+
+class EmbeddingBatcher:
+    """Coalesces embedding calls into multi-input requests.
+
+    `fn(texts) -> vectors` must embed a list of texts in one provider request
+    and return the vectors in the same order. Concurrent embed() calls that
+    arrive within max_wait seconds of each other share a request.
+    """
+
+    def __init__(self, gateway, fn, max_batch_size=64, max_wait=0.01):
+        self.gateway = gateway
+        self.fn = fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self._pending = [] # (text, Future)
+        self._lock = threading.Lock()
+
+    def embed_many(self, texts):
+        """Embeds a list of texts in chunks of max_batch_size."""
+        vectors = []
+        for start in range(0, len(texts), self.max_batch_size):
+            chunk = list(texts[start:start + self.max_batch_size])
+            vectors.extend(self.gateway.call(self.fn, chunk))
+        return vectors
+
+    def embed(self, text):
+        """Embeds one text, sharing a provider request with concurrent callers."""
+        future = Future()
+        with self._lock:
+            self._pending.append((text, future))
+            leader = len(self._pending) == 1
+        if leader:
+            # First caller waits briefly for company, then sends the batch.
+            time.sleep(self.max_wait)
+            while True:
+                with self._lock:
+                    batch = self._pending[:self.max_batch_size]
+                    self._pending = self._pending[self.max_batch_size:]
+                if not batch:
+                    break
+                self._send(batch)
+        return future.result()
+
+    def _send(self, batch):
+        try:
+            vectors = self.gateway.call(self.fn, [text for text, _ in batch])
+            if len(vectors) != len(batch):
+                raise ValueError(f"Embedding provider returned {len(vectors)} vectors for {len(batch)} inputs")
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        for (_, future), vector in zip(batch, vectors):
+            future.set_result(vector)
+
+
+# --- Per-process gateways ---
+# Limits are per worker process; the header-driven limiter is what keeps all
+# workers in line with the account-wide limits.
+
+_gateways = ProcessLocal(dict) # provider -> ProviderGateway
+_gateways_lock = threading.Lock()
+
+def get_gateway(provider):
+    """Returns this process's gateway for a provider ('openai', 'gemini'), configured from current_app."""
+    gateways = _gateways.get()
+    with _gateways_lock:
+        gateway = gateways.get(provider)
+        if gateway is None:
+            config = current_app.config
+            gateway = ProviderGateway(
+                provider,
+                max_concurrency=config.get(f'{provider.upper()}_MAX_CONCURRENCY', config['PROVIDER_MAX_CONCURRENCY']),
+                max_retries=config['PROVIDER_MAX_RETRIES'],
+                backoff_base=config['PROVIDER_BACKOFF_BASE'],
+                backoff_max=config['PROVIDER_BACKOFF_MAX'],
+            )
+            gateways[provider] = gateway
+    return gateway
@@ -4,6 +4,22 @@ from app.utils.logging_config import get_logger
 
 log = get_logger(__name__)
 
+# embedding_service is imported where it's used: it pulls in numpy, which
+# create_app shouldn't pay for.
+EMBEDDING_OWNER_TYPE = 'system_message'
+
+def embedding_text(name, content):
+    """The text a system message is embedded from."""
+    return f"{name}\n{content}"
+
+def _index_system_message(user_id, message_id, name, content):
+    """Stores the message's embedding for semantic search; never fails the write itself."""
+    try:
+        from . import embedding_service
+        embedding_service.index_text(user_id, EMBEDDING_OWNER_TYPE, message_id, embedding_text(name, content))
+    except Exception as e:
+        log.error("Exception indexing system message", user_id=user_id, message_id=message_id, error=str(e), exc_info=True)
+
 def create_system_message(user_id, name, content):
     """Creates a new system message for a user."""
     try:
@@ -19,6 +35,7 @@ def create_system_message(user_id, name, content):
         )
         if message_id:
             log.info("System message created", user_id=user_id, name=name, message_id=message_id)
+            _index_system_message(user_id, message_id, name, content)
             return message_id, "System message created successfully."
         else:
             log.error("System message creation failed during insert", user_id=user_id, name=name)
@@ -59,6 +76,31 @@ def get_system_message_by_id(user_id, message_id):
         log.error("Exception retrieving system message by ID", user_id=user_id, message_id=message_id, error=str(e), exc_info=True)
         return None
 
+def search_system_messages(user_id, text, k=5):
+    """Finds the user's system messages most similar to text. Returns messages with a 'score', best first."""
+    try:
+        from . import embedding_service
+        hits = embedding_service.search(user_id, EMBEDDING_OWNER_TYPE, text, k)
+        if hits is None:
+            return None
+        if not hits:
+            return []
+        placeholders = ", ".join("?" for _ in hits)
+        rows = query_db(
+            f"SELECT id, name, content, created_at FROM system_messages WHERE user_id = ? AND id IN ({placeholders})",
+            (user_id, *[message_id for message_id, _ in hits])
+        )
+        by_id = {row['id']: dict(row) for row in rows}
+        results = []
+        for message_id, score in hits:
+            if message_id in by_id: # Skip vectors whose message is gone
+                results.append({**by_id[message_id], "score": score})
+        log.debug("Searched system messages", user_id=user_id, k=k, count=len(results))
+        return results
+    except Exception as e:
+        log.error("Exception searching system messages", user_id=user_id, error=str(e), exc_info=True)
+        return None
+
 def update_system_message(user_id, message_id, name, content):
     """Updates a system message, ensuring ownership."""
     try:
@@ -81,6 +123,7 @@ def update_system_message(user_id, message_id, name, content):
         updated_message = get_system_message_by_id(user_id, message_id)
         if updated_message and updated_message['name'] == name and updated_message['content'] == content:
              log.info("System message updated successfully", user_id=user_id, message_id=message_id)
+             _index_system_message(user_id, message_id, name, content)
              return True, "System message updated successfully."
         else:
              # Could be that the message_id didn't exist or didn't belong to user
@@ -113,6 +156,11 @@ def delete_system_message(user_id, message_id):
         # Verify deletion
         if get_system_message_by_id(user_id, message_id) is None:
             log.info("System message deleted successfully", user_id=user_id, message_id=message_id)
+            try:
+                from . import embedding_service
+                embedding_service.remove(user_id, EMBEDDING_OWNER_TYPE, message_id)
+            except Exception as e:
+                log.error("Exception removing system message embedding", user_id=user_id, message_id=message_id, error=str(e), exc_info=True)
             return True, "System message deleted successfully."
         else:
             # This shouldn't happen if the DELETE worked and get_system_message_by_id is correct
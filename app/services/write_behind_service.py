@@ -0,0 +1,251 @@
+# app/services/write_behind_service.py
+import atexit
+import queue
+import threading
+import time
+from flask import current_app
+
+from app.extensions import LazyClient
+from .db_service import connect, get_backend, query_db
+from app.utils.logging_config import get_logger
+
+log = get_logger(__name__)
+
+# Durability modes (Config.WRITE_BEHIND_DURABILITY):
+#   'sync'    - no queue; write immediately on the request's connection
+#   'batched' - queue and write in batches; callers block while the queue is full
+#   'lossy'   - queue and write in batches; records are dropped while the queue is full
+DURABILITY_MODES = ('sync', 'batched', 'lossy')
+
+_STOP = object()
+
+class _FlushRequest:
+    def __init__(self):
+        self.done = threading.Event()
+
+
+class WriteBehindQueue:
+    """Bounded in-process queue of non-critical writes, drained by a background thread.
+
+    Records are grouped into one transaction per batch; a batch is written when
+    it reaches batch_size or flush_interval seconds after its first record.
+    stats() is logged at most every stats_interval seconds while writing.
+    """
+
+    def __init__(self, database_url, max_size=10000, batch_size=500, flush_interval=1.0, block_when_full=True,
+                 stats_interval=60.0):
+        self.database_url = database_url
+        self.Error = get_backend(database_url).Error
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.block_when_full = block_when_full
+        self.stats_interval = stats_interval
+        self._last_stats_log = time.monotonic()
+        self._queue = queue.Queue(maxsize=max_size)
+        self._thread = None
+        self._lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            "enqueued": 0, "written": 0, "dropped": 0, "failed": 0,
+            "flushes": 0, "last_flush_ms": 0.0, "max_flush_ms": 0.0, "total_flush_ms": 0.0,
+        }
+
+    def start(self):
+        """Starts the writer thread if it isn't running yet."""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+                self._thread.start()
+                log.info("Write-behind writer started", database_url=self.database_url)
+
+    def submit(self, query, args=()):
+        """Queues a write. Returns False if it was dropped because the queue is full."""
+        self.start()
+        try:
+            if self.block_when_full:
+                self._queue.put((query, args))
+            else:
+                self._queue.put_nowait((query, args))
+        except queue.Full:
+            self._bump("dropped")
+            log.warning("Write-behind queue full, record dropped", queued=self._queue.qsize())
+            return False
+        self._bump("enqueued")
+        return True
+
+    def flush(self, timeout=None):
+        """Blocks until every record queued before this call has been written.
+
+        Returns False on timeout, or when records are queued but no writer is
+        running to write them (stats()['depth'] has the count).
+        """
+        if self._thread is None or not self._thread.is_alive():
+            depth = self.stats()["depth"]
+            if depth:
+                log.warning("Write-behind flush with no writer running", depth=depth)
+                return False
+            return True
+        request = _FlushRequest()
+        self._queue.put(request)
+        return request.done.wait(timeout)
+
+    def stop(self, timeout=5.0):
+        """Writes out everything still queued and stops the writer thread."""
+        with self._lock:
+            thread = self._thread
+            if thread is None or not thread.is_alive():
+                return
+            self._queue.put(_STOP)
+        thread.join(timeout)
+        log.info("Write-behind writer stopped", **self.stats())
+
+    def stats(self):
+        """Returns counters plus queue depth and flush latency (ms).
+
+        depth counts every accepted record not written yet, including those the
+        writer has already taken into the batch it is building.
+        """
+        with self._stats_lock:
+            stats = dict(self._stats)
+        # Clamped: submit() counts a record just after queueing it, so the writer can get there first
+        stats["depth"] = max(0, stats["enqueued"] - stats["written"] - stats["failed"])
+        total_flush_ms = stats.pop("total_flush_ms")
+        stats["avg_flush_ms"] = total_flush_ms / stats["flushes"] if stats["flushes"] else 0.0
+        return stats
+
+    def _bump(self, key, amount=1):
+        with self._stats_lock:
+            self._stats[key] += amount
+
+    def _run(self):
+        db = connect(self.database_url)
+        try:
+            while True:
+                item = self._queue.get()
+                batch, waiters, stopping = [], [], False
+                deadline = time.monotonic() + self.flush_interval
+                while True:
+                    if item is _STOP:
+                        stopping = True
+                    elif isinstance(item, _FlushRequest):
+                        waiters.append(item)
+                    else:
+                        batch.append(item)
+                    # Flush/stop requests cut the batch short; everything before them is included.
+                    if stopping or waiters or len(batch) >= self.batch_size:
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    try:
+                        item = self._queue.get(timeout=remaining)
+                    except queue.Empty:
+                        break
+
+                if batch:
+                    self._write_batch(db, batch)
+                for waiter in waiters:
+                    waiter.done.set()
+                if stopping:
+                    # Drain anything that raced in behind the stop marker.
+                    leftover = []
+                    while True:
+                        try:
+                            item = self._queue.get_nowait()
+                        except queue.Empty:
+                            break
+                        if isinstance(item, _FlushRequest):
+                            item.done.set()
+                        elif item is not _STOP:
+                            leftover.append(item)
+                    if leftover:
+                        self._write_batch(db, leftover)
+                    return
+        finally:
+            db.close()
+
+    def _write_batch(self, db, batch):
+        start = time.perf_counter()
+        try:
+            with db: # One transaction for the whole batch
+                for query, args in batch:
+                    db.execute(query, args)
+            written = len(batch)
+        except self.Error as e:
+            log.error("Write-behind batch failed, retrying records individually", size=len(batch), error=str(e))
+            written = 0
+            for query, args in batch:
+                try:
+                    with db:
+                        db.execute(query, args)
+                    written += 1
+                except self.Error as e:
+                    self._bump("failed")
+                    log.error("Write-behind record failed", query=query, error=str(e))
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        with self._stats_lock:
+            self._stats["written"] += written
+            self._stats["flushes"] += 1
+            self._stats["last_flush_ms"] = elapsed_ms
+            self._stats["total_flush_ms"] += elapsed_ms
+            self._stats["max_flush_ms"] = max(self._stats["max_flush_ms"], elapsed_ms)
+        log.debug("Write-behind batch flushed", size=len(batch), written=written,
+                  flush_ms=round(elapsed_ms, 2), queued=self._queue.qsize())
+        if time.monotonic() - self._last_stats_log >= self.stats_interval:
+            self._last_stats_log = time.monotonic()
+            log.info("Write-behind stats", **self.stats())
+
+
+# --- Per-process queue ---
+# Created on first use so that a gunicorn master (preload_app) never starts the
+# thread; each forked worker gets its own queue and writer.
+
+def _make_writer(config):
+    return WriteBehindQueue(
+        config['DATABASE_URL'],
+        max_size=config['WRITE_BEHIND_MAX_QUEUE'],
+        batch_size=config['WRITE_BEHIND_BATCH_SIZE'],
+        flush_interval=config['WRITE_BEHIND_FLUSH_INTERVAL'],
+        block_when_full=config['WRITE_BEHIND_DURABILITY'] != 'lossy',
+        stats_interval=config['WRITE_BEHIND_STATS_INTERVAL'],
+    )
+
+_writer = LazyClient('write_behind', _make_writer)
+
+def get_writer():
+    """Returns this process's WriteBehindQueue, or None when running in 'sync' mode."""
+    config = current_app.config
+    if config['WRITE_BEHIND_DURABILITY'] == 'sync':
+        return None
+    if config['DATABASE_URL'].endswith(':memory:'):
+        # A background connection would see a different in-memory database.
+        return None
+    return _writer.get()
+
+def record(query, args=()):
+    """Records a non-critical write (usage, audit, last-seen) off the request path."""
+    writer = get_writer()
+    if writer is None:
+        query_db(query, args)
+        return True
+    return writer.submit(query, args)
+
+def stats():
+    """Returns this process's queue stats, or None if no writer has been created here."""
+    writer = _writer.peek()
+    return writer.stats() if writer is not None else None
+
+def shutdown(timeout=5.0):
+    """Flushes and stops this process's writer, if any."""
+    writer = _writer.peek()
+    if writer is not None:
+        writer.stop(timeout)
+
+atexit.register(shutdown)
+
+def init_app(app):
+    """Validate write-behind configuration."""
+    durability = app.config['WRITE_BEHIND_DURABILITY']
+    if durability not in DURABILITY_MODES:
+        raise ValueError(f"WRITE_BEHIND_DURABILITY must be one of {DURABILITY_MODES}, got {durability!r}")
+    log.debug("Write-behind service configured", durability=durability)
@@ -0,0 +1,47 @@
+# app/utils/process_local.py
+import os
+import threading
+
+
+class ProcessLocal:
+    """An object built on first use and owned by the process that built it.
+
+    After a fork (gunicorn workers with preload_app) the child sees the
+    parent's object as not loaded and builds its own, so connection pools,
+    threads and locks are never shared across processes.
+    """
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._value = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _build(self):
+        return self._factory()
+
+    def get(self):
+        """Returns this process's object, building it if needed."""
+        if not self.loaded:
+            with self._lock:
+                if not self.loaded:
+                    self._value = self._build()
+                    self._pid = os.getpid()
+        return self._value
+
+    def peek(self):
+        """Returns this process's object if it has been built, else None (never builds)."""
+        value, pid = self._value, self._pid
+        if value is None or pid != os.getpid():
+            return None
+        return value
+
+    def reset(self):
+        """Drops the cached object so the next get() builds a fresh one."""
+        with self._lock:
+            self._value = None
+            self._pid = None
+
+    @property
+    def loaded(self):
+        return self.peek() is not None
@@ -5,6 +5,7 @@ import os
 # Create app instance using config based on FLASK_ENV or default
 # This ensures Gunicorn uses the correct config (e.g., production)
 # You might need to adjust Config class selection based on your deployment strategy
+# gunicorn.conf.py preloads this module in the master (preload_app) so workers share it
 app = create_app()
 
 if __name__ == "__main__":
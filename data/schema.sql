@@ -1,6 +1,9 @@
 -- data/schema.sql
 DROP TABLE IF EXISTS users;
 DROP TABLE IF EXISTS system_messages;
+DROP TABLE IF EXISTS chat_histories;
+DROP TABLE IF EXISTS chat_messages;
+DROP TABLE IF EXISTS embeddings;
 
 -- data/schema.sql
 -- Users Table
@@ -8,7 +11,9 @@ CREATE TABLE IF NOT EXISTS users (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
     username TEXT UNIQUE NOT NULL,
     password_hash TEXT NOT NULL,
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    last_seen_at TIMESTAMP, -- Written via the write-behind queue
+    embeddings_version INTEGER NOT NULL DEFAULT 0 -- Bumped on every embeddings change; invalidates cached search shards
 );
 
 -- System Messages Table (Example Feature)
@@ -24,11 +29,40 @@ CREATE TABLE IF NOT EXISTS system_messages (
 -- CREATE UNIQUE INDEX IF NOT EXISTS idx_system_messages_user_name ON system_messages (user_id, name);
 
 
--- Chat History Table (Placeholder - Add later)
--- CREATE TABLE IF NOT EXISTS chat_histories ( ... );
+-- Chat History Table
+CREATE TABLE IF NOT EXISTS chat_histories (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL,
+    title TEXT NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE
+);
 
--- Chat Messages Table (Placeholder - Add later)
--- CREATE TABLE IF NOT EXISTS chat_messages ( ... );
+-- Chat Messages Table
+CREATE TABLE IF NOT EXISTS chat_messages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    history_id INTEGER NOT NULL,
+    role TEXT NOT NULL, -- 'user' or 'assistant'
+    content TEXT NOT NULL,
+    token_count INTEGER NOT NULL, -- Counted once on write, used for context assembly
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (history_id) REFERENCES chat_histories (id) ON DELETE CASCADE
+);
+CREATE INDEX IF NOT EXISTS idx_chat_messages_history ON chat_messages (history_id, id);
+
+-- Embeddings Table (semantic search; one row per embedded item)
+CREATE TABLE IF NOT EXISTS embeddings (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL,
+    owner_type TEXT NOT NULL, -- e.g. 'system_message'
+    owner_id INTEGER NOT NULL,
+    model TEXT NOT NULL, -- Embedder that produced the vector
+    vector BLOB NOT NULL, -- float32 array, L2-normalized
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE
+);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_embeddings_owner ON embeddings (owner_type, owner_id);
+CREATE INDEX IF NOT EXISTS idx_embeddings_user ON embeddings (user_id, owner_type, model);
 
 -- JWT Blocklist Table (Optional - Add if implementing refresh token revocation)
 -- CREATE TABLE IF NOT EXISTS token_blocklist ( ... );
\ No newline at end of file
@@ -0,0 +1,58 @@
+-- data/schema_postgres.sql
+-- PostgreSQL version of schema.sql; keep the two in sync.
+DROP TABLE IF EXISTS embeddings CASCADE;
+DROP TABLE IF EXISTS chat_messages CASCADE;
+DROP TABLE IF EXISTS chat_histories CASCADE;
+DROP TABLE IF EXISTS system_messages CASCADE;
+DROP TABLE IF EXISTS users CASCADE;
+
+-- Users Table
+CREATE TABLE IF NOT EXISTS users (
+    id SERIAL PRIMARY KEY,
+    username TEXT UNIQUE NOT NULL,
+    password_hash TEXT NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    last_seen_at TIMESTAMP, -- Written via the write-behind queue
+    embeddings_version INTEGER NOT NULL DEFAULT 0 -- Bumped on every embeddings change; invalidates cached search shards
+);
+
+-- System Messages Table
+CREATE TABLE IF NOT EXISTS system_messages (
+    id SERIAL PRIMARY KEY,
+    user_id INTEGER NOT NULL REFERENCES users (id) ON DELETE CASCADE,
+    name TEXT NOT NULL,
+    content TEXT NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Chat History Table
+CREATE TABLE IF NOT EXISTS chat_histories (
+    id SERIAL PRIMARY KEY,
+    user_id INTEGER NOT NULL REFERENCES users (id) ON DELETE CASCADE,
+    title TEXT NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Chat Messages Table
+CREATE TABLE IF NOT EXISTS chat_messages (
+    id SERIAL PRIMARY KEY,
+    history_id INTEGER NOT NULL REFERENCES chat_histories (id) ON DELETE CASCADE,
+    role TEXT NOT NULL, -- 'user' or 'assistant'
+    content TEXT NOT NULL,
+    token_count INTEGER NOT NULL, -- Counted once on write, used for context assembly
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_chat_messages_history ON chat_messages (history_id, id);
+
+-- Embeddings Table (semantic search; one row per embedded item)
+CREATE TABLE IF NOT EXISTS embeddings (
+    id SERIAL PRIMARY KEY,
+    user_id INTEGER NOT NULL REFERENCES users (id) ON DELETE CASCADE,
+    owner_type TEXT NOT NULL, -- e.g. 'system_message'
+    owner_id INTEGER NOT NULL,
+    model TEXT NOT NULL, -- Embedder that produced the vector
+    vector BYTEA NOT NULL, -- float32 array, L2-normalized
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_embeddings_owner ON embeddings (owner_type, owner_id);
+CREATE INDEX IF NOT EXISTS idx_embeddings_user ON embeddings (user_id, owner_type, model);
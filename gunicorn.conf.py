@@ -0,0 +1,29 @@
+# gunicorn.conf.py
+# Usage: gunicorn -c gunicorn.conf.py
+import gc
+import multiprocessing
+import os
+
+wsgi_app = "app.wsgi:app"
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:5000')
+workers = int(os.environ.get('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+
+# Build the app once in the master and fork workers from it, so the imported
+# modules are shared copy-on-write instead of being loaded per worker.
+preload_app = True
+
+def when_ready(server):
+    # Move everything allocated during preload into the permanent generation so
+    # the cyclic GC in the workers doesn't touch (and un-share) those pages.
+    gc.freeze()
+
+def post_fork(server, worker):
+    # Provider clients hold HTTP connection pools that must not be shared
+    # across processes; make sure each worker builds its own.
+    from app.extensions import reset_clients
+    reset_clients()
+
+def worker_exit(server, worker):
+    # Write out any queued non-critical writes before the worker goes away.
+    from app.services import write_behind_service
+    write_behind_service.shutdown()
@@ -0,0 +1,50 @@
+# tests/base.py
+import unittest
+import json
+from app import create_app
+from app.config import TestConfig
+from app.services import db_service
+from app.services import auth_service
+
+class AppTestCase(unittest.TestCase):
+    """Base test case sharing one app and one pre-built database per process.
+
+    The schema (plus a registered 'testuser') is built once and kept as an
+    in-memory snapshot; every test starts from a fresh copy of it via the
+    SQLite backup API instead of re-running schema.sql. Backends without
+    snapshot support (PostgreSQL) rebuild the schema for every test instead.
+    """
+    app = None
+    snapshot = None
+
+    @classmethod
+    def setUpClass(cls):
+        if AppTestCase.app is None:
+            AppTestCase.app = create_app(TestConfig)
+            with AppTestCase.app.app_context():
+                if db_service.supports_snapshots():
+                    cls.reset_database()
+                    AppTestCase.snapshot = db_service.snapshot_db()
+
+    @staticmethod
+    def reset_database():
+        db_service.init_db()
+        auth_service.register_user('testuser', 'password')
+
+    def setUp(self):
+        """Push an app context and reset the database from the snapshot."""
+        self.client = self.app.test_client()
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        if self.snapshot is not None:
+            db_service.restore_db(self.snapshot)
+        else:
+            self.reset_database()
+
+        login_resp = self.client.post('/api/v1/auth/login', json={'username': 'testuser', 'password': 'password'})
+        self.access_token = json.loads(login_resp.data)['access_token']
+        self.auth_headers = {'Authorization': f'Bearer {self.access_token}'}
+
+    def tearDown(self):
+        """Pop the app context (closes this test's connection)."""
+        self.app_context.pop()
@@ -0,0 +1,91 @@
+# tests/fake_provider.py
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+class FakeProvider:
+    """Local OpenAI-compatible embeddings endpoint that injects 429s and latency.
+
+    - fail_next: number of upcoming requests answered with 429 (+ retry-after)
+    - latency: seconds each request takes
+    - remaining: value sent as x-ratelimit-remaining-requests
+    Records every request's inputs and the peak number of concurrent requests.
+    """
+
+    def __init__(self, latency=0.0, fail_next=0, retry_after='0.05', remaining=1000, reset='1s', dim=3):
+        self.latency = latency
+        self.fail_next = fail_next
+        self.retry_after = retry_after
+        self.remaining = remaining
+        self.reset = reset
+        self.dim = dim
+        self.requests = [] # List of input lists, in arrival order
+        self.statuses = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler_class())
+        self._thread = threading.Thread(target=self._server.serve_forever, kwargs={"poll_interval": 0.01}, daemon=True)
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address
+        return f"http://{host}:{port}/v1"
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _handler_class(self):
+        provider = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+                with provider._lock:
+                    provider.in_flight += 1
+                    provider.max_in_flight = max(provider.max_in_flight, provider.in_flight)
+                    fail = provider.fail_next > 0
+                    if fail:
+                        provider.fail_next -= 1
+                try:
+                    time.sleep(provider.latency)
+                    inputs = body['input'] if isinstance(body['input'], list) else [body['input']]
+                    with provider._lock:
+                        provider.requests.append(inputs)
+                    if fail:
+                        self._reply(429, {"error": {"message": "Rate limit exceeded", "type": "rate_limit_error"}},
+                                    {'retry-after': provider.retry_after, 'x-ratelimit-remaining-requests': '0',
+                                     'x-ratelimit-reset-requests': provider.retry_after})
+                        return
+                    data = [{"object": "embedding", "index": i, "embedding": [float(len(text))] * provider.dim}
+                            for i, text in enumerate(inputs)]
+                    self._reply(200, {"object": "list", "data": data, "model": body.get('model'),
+                                      "usage": {"prompt_tokens": 1, "total_tokens": 1}},
+                                {'x-ratelimit-remaining-requests': str(provider.remaining),
+                                 'x-ratelimit-reset-requests': provider.reset})
+                finally:
+                    with provider._lock:
+                        provider.in_flight -= 1
+
+            def _reply(self, status, payload, headers):
+                raw = json.dumps(payload).encode()
+                with provider._lock:
+                    provider.statuses.append(status)
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(raw)))
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(raw)
+
+        return Handler
@@ -0,0 +1,82 @@
+# tests/test_context_service.py
+import unittest
+from unittest import mock
+from app.services import chat_service, context_service, db_service, system_message_service
+from tests.base import AppTestCase
+
+class ContextServiceTestCase(AppTestCase):
+    def setUp(self):
+        super().setUp()
+        context_service.clear_caches()
+        self.user_id = db_service.query_db("SELECT id FROM users WHERE username = ?", ('testuser',), one=True)['id']
+        self.history_id, _ = chat_service.create_chat_history(self.user_id, 'Test Chat')
+
+    def add(self, role, content):
+        message_id, message = chat_service.add_chat_message(self.user_id, self.history_id, role, content)
+        self.assertIsNotNone(message_id, message)
+        return message_id
+
+    def test_token_count_is_stored_on_write(self):
+        self.add('user', 'Hello there, how are you?')
+        messages = chat_service.get_chat_messages(self.user_id, self.history_id)
+        self.assertEqual(messages[0]['token_count'], context_service.count_message_tokens('Hello there, how are you?'))
+
+    def test_invalid_role_is_rejected(self):
+        message_id, message = chat_service.add_chat_message(self.user_id, self.history_id, 'wizard', 'hi')
+        self.assertIsNone(message_id)
+        self.assertIn('Role', message)
+
+    def test_context_includes_system_message_and_history(self):
+        system_id, _ = system_message_service.create_system_message(self.user_id, 'Helper', 'You are helpful.')
+        self.add('user', 'Hi')
+        self.add('assistant', 'Hello!')
+
+        context = context_service.assemble_context(self.user_id, self.history_id, system_message_id=system_id)
+        self.assertEqual([m['role'] for m in context['messages']], ['system', 'user', 'assistant'])
+        self.assertEqual(context['messages'][0]['content'], 'You are helpful.')
+        self.assertFalse(context['truncated'])
+
+    def test_history_is_trimmed_to_budget(self):
+        for i in range(20):
+            self.add('user', f'message number {i} ' + 'word ' * 20)
+        per_message = context_service.count_message_tokens('message number 10 ' + 'word ' * 20)
+        budget = per_message * 5
+        max_tokens = budget + self.app.config['CONTEXT_RESPONSE_RESERVE_TOKENS']
+        context = context_service.assemble_context(self.user_id, self.history_id, max_tokens=max_tokens)
+        self.assertTrue(context['truncated'])
+        self.assertLessEqual(context['token_count'], budget)
+        self.assertEqual(len(context['messages']), 5)
+        self.assertTrue(context['messages'][-1]['content'].startswith('message number 19 '))
+
+    def test_next_turn_only_reads_new_messages(self):
+        for i in range(10):
+            self.add('user', f'old {i}')
+        context_service.assemble_context(self.user_id, self.history_id)
+
+        self.add('assistant', 'new reply')
+        rows_read = []
+        real_query_db = context_service.query_db
+        def counting_query_db(query, args=(), one=False):
+            rv = real_query_db(query, args, one)
+            if 'FROM chat_messages' in query:
+                rows_read.extend(rv)
+            return rv
+
+        with mock.patch.object(context_service, 'query_db', counting_query_db):
+            context = context_service.assemble_context(self.user_id, self.history_id)
+        self.assertEqual(len(rows_read), 1)
+        self.assertEqual(len(context['messages']), 11)
+        self.assertEqual(context['messages'][-1]['content'], 'new reply')
+
+    def test_system_message_tokens_are_cached_by_content(self):
+        with mock.patch.object(context_service, 'count_message_tokens', wraps=context_service.count_message_tokens) as counter:
+            first = context_service.get_system_message_tokens('You are a pirate.')
+            second = context_service.get_system_message_tokens('You are a pirate.')
+        self.assertEqual(first, second)
+        self.assertEqual(counter.call_count, 1)
+
+    def test_foreign_history_is_rejected(self):
+        self.assertIsNone(context_service.assemble_context(self.user_id + 1, self.history_id))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,172 @@
+# tests/test_data_transfer.py
+import unittest
+import gzip
+import json
+import os
+import tempfile
+from app.services import chat_service, db_service, embedding_service
+from tests.base import AppTestCase
+
+def read_archive(data):
+    return [json.loads(line) for line in gzip.decompress(data).splitlines()]
+
+def make_archive(records):
+    return gzip.compress(b''.join(json.dumps(r).encode() + b'\n' for r in records))
+
+class DataTransferTestCase(AppTestCase):
+    def setUp(self):
+        super().setUp()
+        embedding_service.clear_shards()
+        self.user_id = db_service.query_db("SELECT id FROM users WHERE username = ?", ('testuser',), one=True)['id']
+
+    def populate(self):
+        for name in ('Pirate', 'Chef'):
+            self.client.post('/api/v1/system_message/', headers=self.auth_headers, json={'name': name, 'content': f'You are a {name.lower()}.'})
+        history_id, _ = chat_service.create_chat_history(self.user_id, 'Voyage')
+        chat_service.add_chat_message(self.user_id, history_id, 'user', 'Ahoy!')
+        chat_service.add_chat_message(self.user_id, history_id, 'assistant', 'Arr, welcome aboard.')
+
+    def clear_user_data(self):
+        db_service.query_db("DELETE FROM chat_messages")
+        db_service.query_db("DELETE FROM chat_histories")
+        db_service.query_db("DELETE FROM embeddings")
+        db_service.query_db("DELETE FROM system_messages")
+
+    def test_export_streams_gzipped_ndjson(self):
+        self.populate()
+        resp = self.client.get('/api/v1/data/export', headers=self.auth_headers)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.mimetype, 'application/gzip')
+        self.assertTrue(resp.is_streamed)
+
+        records = read_archive(resp.data)
+        self.assertEqual(records[0]['type'], 'header')
+        self.assertEqual([r['type'] for r in records[1:]],
+                         ['user', 'system_message', 'system_message', 'chat_history', 'chat_message', 'chat_message'])
+        self.assertNotIn('password_hash', records[1])
+
+    def test_api_round_trip_into_own_account(self):
+        self.populate()
+        archive = self.client.get('/api/v1/data/export', headers=self.auth_headers).data
+        self.clear_user_data()
+
+        resp = self.client.post('/api/v1/data/import', headers=self.auth_headers, data=archive)
+        self.assertEqual(resp.status_code, 200)
+        imported = json.loads(resp.data)['imported']
+        self.assertEqual((imported['system_message'], imported['chat_history'], imported['chat_message']), (2, 1, 2))
+        self.assertEqual((imported['user'], imported['skipped']), (0, 0)) # The user record only maps IDs
+
+        names = [m['name'] for m in json.loads(self.client.get('/api/v1/system_message/', headers=self.auth_headers).data)]
+        self.assertEqual(names, ['Chef', 'Pirate'])
+        history = db_service.query_db("SELECT id FROM chat_histories WHERE user_id = ?", (self.user_id,), one=True)
+        messages = chat_service.get_chat_messages(self.user_id, history['id'])
+        self.assertEqual([m['content'] for m in messages], ['Ahoy!', 'Arr, welcome aboard.'])
+
+        # Embeddings are rebuilt on import, so search works straight away
+        search = json.loads(self.client.get('/api/v1/system_message/search', headers=self.auth_headers, query_string={'q': 'pirate'}).data)
+        self.assertEqual(search[0]['name'], 'Pirate')
+
+    def test_reimport_does_not_duplicate(self):
+        self.populate()
+        archive = self.client.get('/api/v1/data/export', headers=self.auth_headers).data
+        imported = json.loads(self.client.post('/api/v1/data/import', headers=self.auth_headers, data=archive).data)['imported']
+        self.assertEqual((imported['system_message'], imported['chat_history'], imported['chat_message']), (0, 0, 0))
+        self.assertEqual(imported['skipped'], 5)
+        self.assertEqual(db_service.query_db("SELECT COUNT(*) AS n FROM chat_histories", one=True)['n'], 1)
+        self.assertEqual(db_service.query_db("SELECT COUNT(*) AS n FROM chat_messages", one=True)['n'], 2)
+
+    def test_reimport_completes_partially_imported_history(self):
+        self.populate()
+        archive = self.client.get('/api/v1/data/export', headers=self.auth_headers).data
+        # As if a failure hit after the first message's batch was committed
+        last = db_service.query_db("SELECT MAX(id) AS id FROM chat_messages", one=True)['id']
+        db_service.query_db("DELETE FROM chat_messages WHERE id = ?", (last,))
+
+        imported = json.loads(self.client.post('/api/v1/data/import', headers=self.auth_headers, data=archive).data)['imported']
+        self.assertEqual((imported['chat_history'], imported['chat_message']), (0, 1))
+        history = db_service.query_db("SELECT id FROM chat_histories WHERE user_id = ?", (self.user_id,), one=True)
+        messages = chat_service.get_chat_messages(self.user_id, history['id'])
+        self.assertEqual([m['content'] for m in messages], ['Ahoy!', 'Arr, welcome aboard.'])
+
+    def test_import_commits_in_batches(self):
+        batch_size = self.app.config['IMPORT_BATCH_SIZE']
+        self.app.config['IMPORT_BATCH_SIZE'] = 3
+        try:
+            records = [{"type": "header", "version": 1}, {"type": "user", "id": 99, "username": "x"},
+                       {"type": "chat_history", "id": 7, "user_id": 99, "title": "Bulk"}]
+            records += [{"type": "chat_message", "id": i, "history_id": 7, "role": "user", "content": f"m{i}"} for i in range(10)]
+            resp = self.client.post('/api/v1/data/import', headers=self.auth_headers, data=make_archive(records))
+        finally:
+            self.app.config['IMPORT_BATCH_SIZE'] = batch_size
+        self.assertEqual(json.loads(resp.data)['imported']['chat_message'], 10)
+        count = db_service.query_db("SELECT COUNT(*) AS n FROM chat_messages", one=True)['n']
+        self.assertEqual(count, 10)
+
+    def test_chat_messages_with_invalid_roles_are_skipped(self):
+        records = [{"type": "header", "version": 1}, {"type": "user", "id": 99, "username": "x"},
+                   {"type": "chat_history", "id": 7, "user_id": 99, "title": "Spells"},
+                   {"type": "chat_message", "id": 1, "history_id": 7, "role": "wizard", "content": "Abracadabra"},
+                   {"type": "chat_message", "id": 2, "history_id": 7, "role": "user", "content": "Hello", "token_count": -5}]
+        imported = json.loads(self.client.post('/api/v1/data/import', headers=self.auth_headers, data=make_archive(records)).data)['imported']
+        self.assertEqual((imported['chat_message'], imported['skipped']), (1, 1))
+        rows = db_service.query_db("SELECT role, token_count FROM chat_messages")
+        self.assertEqual([r['role'] for r in rows], ['user'])
+        self.assertGreater(rows[0]['token_count'], 0) # Bogus counts are recomputed
+
+    def test_invalid_archives_are_rejected(self):
+        resp = self.client.post('/api/v1/data/import', headers=self.auth_headers, data=b'not gzip')
+        self.assertEqual(resp.status_code, 400)
+        resp = self.client.post('/api/v1/data/import', headers=self.auth_headers,
+                                data=make_archive([{"type": "system_message", "user_id": 1, "name": "a", "content": "b"}]))
+        self.assertEqual(resp.status_code, 400)
+        self.assertIn('header', json.loads(resp.data)['error'])
+
+    def test_api_import_rejects_multi_user_archives(self):
+        records = [{"type": "header", "version": 1},
+                   {"type": "user", "id": 1, "username": "alice"},
+                   {"type": "system_message", "id": 1, "user_id": 1, "name": "Alice's", "content": "x"},
+                   {"type": "user", "id": 2, "username": "bob"},
+                   {"type": "system_message", "id": 2, "user_id": 2, "name": "Bob's", "content": "y"}]
+        resp = self.client.post('/api/v1/data/import', headers=self.auth_headers, data=make_archive(records))
+        self.assertEqual(resp.status_code, 400)
+        self.assertIn('more than one user', json.loads(resp.data)['error'])
+        count = db_service.query_db("SELECT COUNT(*) AS n FROM system_messages", one=True)['n']
+        self.assertEqual(count, 0)
+
+    def test_corrupt_deflate_stream_is_rejected(self):
+        archive = bytearray(make_archive([{"type": "header", "version": 1}] + [{"type": "user", "id": i, "username": f"u{i}"} for i in range(50)]))
+        for i in range(12, len(archive) - 8): # Past the gzip header, before the trailer
+            archive[i] ^= 0xFF
+        resp = self.client.post('/api/v1/data/import', headers=self.auth_headers, data=bytes(archive))
+        self.assertEqual(resp.status_code, 400)
+        self.assertIn('Invalid archive', json.loads(resp.data)['error'])
+
+    def test_malformed_records_are_rejected(self):
+        header = {"type": "header", "version": 1}
+        user = {"type": "user", "id": 1, "username": "x"}
+        for bad in ([1, 2], {"type": "system_message", "user_id": 1, "name": ["a"], "content": "b"}):
+            resp = self.client.post('/api/v1/data/import', headers=self.auth_headers, data=make_archive([header, user, bad]))
+            self.assertEqual(resp.status_code, 400, bad)
+        count = db_service.query_db("SELECT COUNT(*) AS n FROM system_messages", one=True)['n']
+        self.assertEqual(count, 0)
+
+    def test_cli_round_trip_recreates_users(self):
+        self.populate()
+        runner = self.app.test_cli_runner()
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, 'backup.ndjson.gz')
+            result = runner.invoke(args=['export-data', path])
+            self.assertIn('Exported data', result.output)
+            self.assertTrue(any(r['type'] == 'user' and r['password_hash'] for r in read_archive(open(path, 'rb').read())))
+
+            self.clear_user_data()
+            db_service.query_db("DELETE FROM users")
+            result = runner.invoke(args=['import-data', path])
+        self.assertIn('Imported 1 users, 2 system messages, 1 chat histories, 2 chat messages', result.output)
+
+        # Password hash survived the trip
+        login = self.client.post('/api/v1/auth/login', json={'username': 'testuser', 'password': 'password'})
+        self.assertEqual(login.status_code, 200)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+# tests/test_db_backends.py
+import unittest
+import os
+from app.services import db_service
+from app.services.db_backends import translate_query, create_backend, SqliteBackend, PostgresBackend
+
+# Set TEST_POSTGRES_URL (e.g. postgresql://postgres@localhost/mr_test) to run the
+# PostgreSQL driver tests; run the whole suite on Postgres via TEST_DATABASE_URL.
+TEST_POSTGRES_URL = os.environ.get('TEST_POSTGRES_URL')
+
+class TranslateQueryTestCase(unittest.TestCase):
+    def test_placeholders_are_rewritten(self):
+        query, needs_returning = translate_query("SELECT id FROM users WHERE username = ? AND id != ?")
+        self.assertEqual(query, "SELECT id FROM users WHERE username = %s AND id != %s")
+        self.assertFalse(needs_returning)
+
+    def test_string_literals_and_percent_are_preserved(self):
+        query, _ = translate_query("SELECT '?' AS q, name FROM t WHERE name LIKE 'a%' AND id = ?")
+        self.assertEqual(query, "SELECT '?' AS q, name FROM t WHERE name LIKE 'a%%' AND id = %s")
+
+    def test_insert_gets_returning_id(self):
+        query, needs_returning = translate_query("INSERT INTO users (username, password_hash) VALUES (?, ?)")
+        self.assertTrue(needs_returning)
+        self.assertTrue(query.endswith("VALUES (%s, %s) RETURNING id"))
+
+        query, needs_returning = translate_query("INSERT INTO t (a) VALUES (?) RETURNING a")
+        self.assertFalse(needs_returning)
+
+
+class BackendSelectionTestCase(unittest.TestCase):
+    def test_backend_is_chosen_by_scheme(self):
+        self.assertIsInstance(create_backend('sqlite:///:memory:'), SqliteBackend)
+        with self.assertRaises(ValueError):
+            create_backend('mysql://localhost/db')
+
+    def test_backends_are_cached_per_url(self):
+        self.assertIs(db_service.get_backend('sqlite:///:memory:'), db_service.get_backend('sqlite:///:memory:'))
+
+
+@unittest.skipUnless(TEST_POSTGRES_URL, "TEST_POSTGRES_URL not set")
+class PostgresBackendTestCase(unittest.TestCase):
+    def setUp(self):
+        self.backend = PostgresBackend(TEST_POSTGRES_URL, pool_min_size=1, pool_max_size=2, prepare_threshold=1)
+        db = self.backend.connect()
+        db.executescript("DROP TABLE IF EXISTS backend_test; CREATE TABLE backend_test (id SERIAL PRIMARY KEY, value TEXT NOT NULL)")
+        db.commit()
+        db.close()
+
+    def tearDown(self):
+        db = self.backend.connect()
+        db.executescript("DROP TABLE IF EXISTS backend_test")
+        db.commit()
+        db.close()
+        self.backend.close_pool()
+
+    def test_insert_and_query_use_sqlite_semantics(self):
+        db = self.backend.acquire()
+        first = db.execute("INSERT INTO backend_test (value) VALUES (?)", ('a',)).lastrowid
+        second = db.execute("INSERT INTO backend_test (value) VALUES (?)", ('b',)).lastrowid
+        db.commit()
+        self.assertEqual(second, first + 1)
+
+        rows = db.execute("SELECT id, value FROM backend_test WHERE id >= ? ORDER BY id", (first,)).fetchall()
+        self.assertEqual([dict(r) for r in rows], [{'id': first, 'value': 'a'}, {'id': second, 'value': 'b'}])
+        self.backend.release(db)
+
+    def test_pool_reuses_connections(self):
+        # Single-connection pool: with more, either idle connection may be handed out
+        backend = PostgresBackend(TEST_POSTGRES_URL, pool_min_size=1, pool_max_size=1)
+        try:
+            db = backend.acquire()
+            raw = db._conn
+            backend.release(db)
+            db = backend.acquire()
+            self.assertIs(db._conn, raw)
+            backend.release(db)
+        finally:
+            backend.close_pool()
+
+    def test_transaction_context_rolls_back_on_error(self):
+        db = self.backend.connect()
+        with self.assertRaises(self.backend.Error):
+            with db:
+                db.execute("INSERT INTO backend_test (value) VALUES (?)", ('kept?',))
+                db.execute("INSERT INTO backend_test (value) VALUES (?)", (None,))
+        self.assertEqual(db.execute("SELECT COUNT(*) AS n FROM backend_test").fetchone()['n'], 0)
+        db.close()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,115 @@
+# tests/test_embedding_service.py
+import unittest
+import json
+import numpy as np
+from unittest import mock
+from app.services import db_service, embedding_service
+from app.services.embedding_service import HashingEmbedder, _Shard
+from tests.base import AppTestCase
+
+class HashingEmbedderTestCase(unittest.TestCase):
+    def test_deterministic_and_normalized(self):
+        embedder = HashingEmbedder(dim=64)
+        vectors = embedder.embed_many(['You are a helpful pirate.', 'You are a helpful pirate.', ''])
+        self.assertEqual(vectors.dtype, np.float32)
+        np.testing.assert_array_equal(vectors[0], vectors[1])
+        self.assertAlmostEqual(float(np.linalg.norm(vectors[0])), 1.0, places=5)
+        self.assertEqual(float(np.linalg.norm(vectors[2])), 0.0)
+
+    def test_similar_texts_score_higher(self):
+        embedder = HashingEmbedder()
+        query = embedder.embed('translate english to french')
+        close = embedder.embed('translator from english into french')
+        far = embedder.embed('write python unit tests')
+        self.assertGreater(float(query @ close), float(query @ far))
+
+
+class ShardSearchTestCase(unittest.TestCase):
+    def make_matrix(self, n, dim=32, seed=1):
+        matrix = np.random.default_rng(seed).standard_normal((n, dim)).astype(np.float32)
+        return matrix / np.linalg.norm(matrix, axis=1, keepdims=True)
+
+    def test_exact_top_k_is_sorted(self):
+        matrix = self.make_matrix(100)
+        shard = _Shard(np.arange(100, 200), matrix, ann_threshold=10_000)
+        hits = shard.search(matrix[42], k=5, probes=1)
+        self.assertEqual(hits[0][0], 142)
+        scores = [score for _, score in hits]
+        self.assertEqual(scores, sorted(scores, reverse=True))
+
+    def test_approximate_index_finds_exact_match(self):
+        matrix = self.make_matrix(2000)
+        shard = _Shard(np.arange(2000), matrix, ann_threshold=1000)
+        self.assertIsNotNone(shard.ivf)
+        for i in (0, 777, 1999):
+            self.assertEqual(shard.search(matrix[i], k=3, probes=4)[0][0], i)
+
+
+class SystemMessageSearchTestCase(AppTestCase):
+    def setUp(self):
+        super().setUp()
+        embedding_service.clear_shards()
+
+    def create(self, name, content):
+        resp = self.client.post('/api/v1/system_message/', headers=self.auth_headers, json={'name': name, 'content': content})
+        return json.loads(resp.data)['id']
+
+    def search(self, q, k=5):
+        resp = self.client.get('/api/v1/system_message/search', headers=self.auth_headers, query_string={'q': q, 'k': k})
+        self.assertEqual(resp.status_code, 200)
+        return json.loads(resp.data)
+
+    def test_embedding_is_stored_as_float32_blob_on_write(self):
+        message_id = self.create('Pirate', 'You talk like a pirate.')
+        row = db_service.query_db("SELECT vector FROM embeddings WHERE owner_type = 'system_message' AND owner_id = ?", (message_id,), one=True)
+        vector = np.frombuffer(row['vector'], dtype=np.float32)
+        self.assertEqual(vector.shape, (self.app.config['EMBEDDING_HASHING_DIM'],))
+
+    def test_search_finds_similar_prompt(self):
+        self.create('Translator', 'Translate English text into French.')
+        pirate_id = self.create('Pirate', 'You talk like a pirate captain on the high seas.')
+        self.create('Reviewer', 'Review Python code for bugs.')
+
+        results = self.search('speak like a pirate', k=2)
+        self.assertEqual(len(results), 2)
+        self.assertEqual(results[0]['id'], pirate_id)
+        self.assertGreaterEqual(results[0]['score'], results[1]['score'])
+
+    def test_update_and_delete_refresh_the_index(self):
+        message_id = self.create('Chef', 'You are a chef who explains recipes.')
+        self.assertEqual(self.search('recipes and cooking')[0]['id'], message_id)
+
+        self.client.put(f'/api/v1/system_message/{message_id}', headers=self.auth_headers,
+                        json={'name': 'Astronomer', 'content': 'You explain stars and galaxies.'})
+        self.assertEqual(self.search('galaxies')[0]['name'], 'Astronomer')
+
+        self.client.delete(f'/api/v1/system_message/{message_id}', headers=self.auth_headers)
+        self.assertEqual(self.search('galaxies'), [])
+
+    def test_writes_from_other_workers_are_seen(self):
+        chef_id = self.create('Chef', 'You are a chef who explains recipes.')
+        self.assertEqual([r['id'] for r in self.search('recipes')], [chef_id])
+
+        # Another worker's writes only reach this process through the DB version
+        with mock.patch.object(embedding_service, '_invalidate'):
+            baker_id = self.create('Baker', 'You bake bread and explain recipes.')
+            self.assertEqual({r['id'] for r in self.search('recipes')}, {chef_id, baker_id})
+            self.client.delete(f'/api/v1/system_message/{chef_id}', headers=self.auth_headers)
+            self.assertEqual([r['id'] for r in self.search('recipes')], [baker_id])
+
+    def test_shards_are_evicted_lru(self):
+        max_shards = self.app.config['EMBEDDING_MAX_SHARDS']
+        self.app.config['EMBEDDING_MAX_SHARDS'] = 2
+        try:
+            for user_id in (1, 2, 3):
+                embedding_service.search(user_id, 'system_message', 'anything')
+            self.assertEqual([key[0] for key in embedding_service._shards], [2, 3])
+        finally:
+            self.app.config['EMBEDDING_MAX_SHARDS'] = max_shards
+
+    def test_search_requires_query(self):
+        resp = self.client.get('/api/v1/system_message/search', headers=self.auth_headers)
+        self.assertEqual(resp.status_code, 400)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,148 @@
+# tests/test_provider_gateway.py
+import unittest
+import threading
+from unittest import mock
+from openai import OpenAI, RateLimitError
+from app.services import provider_gateway
+from app.services.provider_gateway import (
+    AdaptiveRateLimiter, EmbeddingBatcher, ProviderGateway, parse_duration,
+)
+from tests.fake_provider import FakeProvider
+
+def make_embed_fn(client):
+    """Multi-input embedding call through the real SDK, returning headers for the limiter."""
+    def embed(texts):
+        raw = client.embeddings.with_raw_response.create(model='fake-embedding', input=texts)
+        return _Result(raw.headers, [item.embedding for item in raw.parse().data])
+    return embed
+
+class _Result(list):
+    def __init__(self, headers, vectors):
+        super().__init__(vectors)
+        self.headers = headers
+
+
+class ParseDurationTestCase(unittest.TestCase):
+    def test_formats(self):
+        self.assertEqual(parse_duration('2'), 2.0)
+        self.assertEqual(parse_duration('20ms'), 0.02)
+        self.assertEqual(parse_duration('6m0s'), 360.0)
+        self.assertEqual(parse_duration('1.5s'), 1.5)
+        self.assertIsNone(parse_duration(None))
+        self.assertIsNone(parse_duration('soon'))
+
+
+class AdaptiveRateLimiterTestCase(unittest.TestCase):
+    def test_exhausted_budget_blocks_until_reset(self):
+        limiter = AdaptiveRateLimiter()
+        self.assertEqual(limiter.update({'x-ratelimit-remaining-requests': '0', 'x-ratelimit-reset-requests': '50ms'}), 0.05)
+        self.assertGreater(limiter.wait(), 0)
+
+    def test_low_budget_spreads_calls(self):
+        limiter = AdaptiveRateLimiter(low_watermark=5)
+        self.assertAlmostEqual(limiter.update({'x-ratelimit-remaining-requests': '2', 'x-ratelimit-reset-requests': '100ms'}), 0.05)
+        self.assertEqual(limiter.update({'x-ratelimit-remaining-requests': '500', 'x-ratelimit-reset-requests': '1s'}), 0.0)
+
+    def release_times(self, limiter, n, now=100.0):
+        """Runs n concurrent wait() calls on a frozen clock; returns when each would be released, sorted."""
+        times = []
+        def worker():
+            times.append(now + limiter.wait())
+        with mock.patch.object(provider_gateway.time, 'monotonic', return_value=now), \
+                mock.patch.object(provider_gateway.time, 'sleep'):
+            threads = [threading.Thread(target=worker) for _ in range(n)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+        return sorted(times)
+
+    def test_concurrent_waiters_are_released_one_interval_apart(self):
+        limiter = AdaptiveRateLimiter(low_watermark=5)
+        with mock.patch.object(provider_gateway.time, 'monotonic', return_value=100.0):
+            interval = limiter.update({'x-ratelimit-remaining-requests': '2', 'x-ratelimit-reset-requests': '100ms'})
+        times = self.release_times(limiter, 6)
+        gaps = [b - a for a, b in zip(times, times[1:])]
+        self.assertEqual(len(gaps), 5)
+        for gap in gaps:
+            self.assertAlmostEqual(gap, interval)
+
+    def test_waiters_after_penalty_do_not_stampede(self):
+        limiter = AdaptiveRateLimiter(low_watermark=5)
+        with mock.patch.object(provider_gateway.time, 'monotonic', return_value=100.0):
+            limiter.penalize(0.1) # Resume spaced 0.1 / 5 = 20ms apart
+        times = self.release_times(limiter, 4)
+        self.assertAlmostEqual(times[0], 100.1)
+        for a, b in zip(times, times[1:]):
+            self.assertAlmostEqual(b - a, 0.02)
+        # A healthy response clears the spacing for slots reserved after it
+        limiter.update(None)
+        times = self.release_times(limiter, 3, now=200.0)
+        self.assertEqual(times, [200.0, 200.0, 200.0])
+
+
+class ProviderGatewayTestCase(unittest.TestCase):
+    def make_client(self, provider):
+        return OpenAI(api_key='test', base_url=provider.base_url, max_retries=0)
+
+    def test_retries_through_429s(self):
+        with FakeProvider(fail_next=2, retry_after='0.02') as provider:
+            gateway = ProviderGateway('fake', max_retries=3, backoff_base=0.01)
+            vectors = gateway.call(make_embed_fn(self.make_client(provider)), ['hello'])
+        self.assertEqual(vectors, [[5.0, 5.0, 5.0]])
+        self.assertEqual(provider.statuses, [429, 429, 200])
+        self.assertEqual(gateway.stats()['rate_limited'], 2)
+        self.assertEqual(gateway.stats()['retries'], 2)
+
+    def test_gives_up_after_max_retries(self):
+        with FakeProvider(fail_next=10, retry_after='0.01') as provider:
+            gateway = ProviderGateway('fake', max_retries=1, backoff_base=0.01)
+            with self.assertRaises(RateLimitError):
+                gateway.call(make_embed_fn(self.make_client(provider)), ['hello'])
+        self.assertEqual(len(provider.statuses), 2)
+        self.assertEqual(gateway.stats()['failures'], 1)
+
+    def test_non_retryable_errors_are_raised_immediately(self):
+        gateway = ProviderGateway('fake', max_retries=3)
+        def broken(texts):
+            raise ValueError("bad input")
+        with self.assertRaises(ValueError):
+            gateway.call(broken, ['x'])
+        self.assertEqual(gateway.stats()['calls'], 1)
+
+    def test_concurrency_is_bounded(self):
+        with FakeProvider(latency=0.05) as provider:
+            gateway = ProviderGateway('fake', max_concurrency=2)
+            embed = make_embed_fn(self.make_client(provider))
+            threads = [threading.Thread(target=gateway.call, args=(embed, [f'text {i}'])) for i in range(8)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+        self.assertEqual(len(provider.requests), 8)
+        self.assertLessEqual(provider.max_in_flight, 2)
+
+    def test_embedding_calls_are_coalesced(self):
+        with FakeProvider(latency=0.01) as provider:
+            gateway = ProviderGateway('fake')
+            batcher = EmbeddingBatcher(gateway, make_embed_fn(self.make_client(provider)), max_batch_size=16, max_wait=0.05)
+            results = {}
+            def worker(text):
+                results[text] = batcher.embed(text)
+            threads = [threading.Thread(target=worker, args=('x' * n,)) for n in range(1, 11)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+        self.assertEqual({text: vec[0] for text, vec in results.items()}, {'x' * n: float(n) for n in range(1, 11)})
+        self.assertLess(len(provider.requests), 10)
+
+    def test_embed_many_chunks_inputs(self):
+        with FakeProvider() as provider:
+            batcher = EmbeddingBatcher(ProviderGateway('fake'), make_embed_fn(self.make_client(provider)), max_batch_size=4)
+            vectors = batcher.embed_many([f'{i:02d}' for i in range(10)])
+        self.assertEqual(len(vectors), 10)
+        self.assertEqual([len(r) for r in provider.requests], [4, 4, 2])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+# tests/test_startup.py
+import unittest
+import json
+import os
+import subprocess
+import sys
+from unittest import mock
+from app import create_app
+from app.config import TestConfig
+from app.extensions import LazyClient
+from app.utils import process_local
+from app.utils.process_local import ProcessLocal
+
+# ~3x measured startup (~0.25s): catches an eager SDK import. Raise via env var on slow CI.
+STARTUP_BUDGET_SECONDS = float(os.environ.get('STARTUP_BUDGET_SECONDS', '0.75'))
+STARTUP_RUNS = 3
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# Run in a fresh interpreter so modules imported by other tests don't hide the cost.
+STARTUP_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+from app import create_app
+from app.config import TestConfig
+create_app(TestConfig)
+elapsed = time.perf_counter() - start
+heavy = [m for m in ('openai', 'google.genai', 'numpy') if m in sys.modules]
+print(json.dumps({"elapsed": elapsed, "heavy_modules": heavy}))
+"""
+
+class StartupTestCase(unittest.TestCase):
+    def run_startup(self):
+        result = subprocess.run(
+            [sys.executable, '-c', STARTUP_SCRIPT],
+            cwd=PROJECT_ROOT, capture_output=True, text=True, check=True
+        )
+        return json.loads(result.stdout.strip().splitlines()[-1])
+
+    def test_create_app_within_budget(self):
+        # Best of a few runs: load from other tests (e.g. pytest -n) only ever adds time
+        elapsed = min(self.run_startup()['elapsed'] for _ in range(STARTUP_RUNS))
+        self.assertLess(elapsed, STARTUP_BUDGET_SECONDS,
+                        f"create_app took {elapsed:.3f}s (budget {STARTUP_BUDGET_SECONDS}s)")
+
+    def test_heavy_modules_not_imported_at_startup(self):
+        stats = self.run_startup()
+        self.assertEqual(stats['heavy_modules'], [])
+
+    def test_lazy_client_builds_once_on_first_use(self):
+        calls = []
+        def factory(config):
+            calls.append(config['TESTING'])
+            return object()
+
+        client = LazyClient('fake', factory)
+        self.assertFalse(client.loaded)
+        app = create_app(TestConfig)
+        with app.app_context():
+            first = client.get()
+            self.assertIs(client.get(), first)
+            self.assertEqual(calls, [True])
+
+            client.reset()
+            self.assertIsNot(client.get(), first)
+            self.assertEqual(len(calls), 2)
+
+    def test_process_local_rebuilds_after_fork(self):
+        built = []
+        local = ProcessLocal(lambda: built.append(1) or object())
+        first = local.get()
+        self.assertIs(local.get(), first)
+        with mock.patch.object(process_local.os, 'getpid', return_value=os.getpid() + 1):
+            # A forked child sees nothing loaded and builds its own object
+            self.assertIsNone(local.peek())
+            self.assertIsNot(local.get(), first)
+        self.assertEqual(len(built), 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,31 +1,9 @@
 # tests/test_system_message.py
 import unittest
 import json
-from app import create_app
-from app.config import TestConfig
-from app.services import db_service
-from app.services import auth_service # To help with login/tokens
-
-class SystemMessageTestCase(unittest.TestCase):
-    def setUp(self):
-        """Set up test client and initialize test database."""
-        self.app = create_app(TestConfig)
-        self.client = self.app.test_client()
-        self.app_context = self.app.app_context()
-        self.app_context.push()
-        db_service.init_db() # Initialize schema in test context
-
-        # Register and log in a test user to get a token
-        auth_service.register_user('testuser', 'password')
-        login_resp = self.client.post('/api/v1/auth/login', json={'username': 'testuser', 'password': 'password'})
-        self.access_token = json.loads(login_resp.data)['access_token']
-        self.auth_headers = {'Authorization': f'Bearer {self.access_token}'}
-
-
-    def tearDown(self):
-        """Clean up database and app context."""
-        self.app_context.pop()
+from tests.base import AppTestCase
 
+class SystemMessageTestCase(AppTestCase):
     def test_create_and_list_system_message(self):
         # 1. Create a message
         create_resp = self.client.post('/api/v1/system_message/', headers=self.auth_headers, json={
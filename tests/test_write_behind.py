@@ -0,0 +1,112 @@
+# tests/test_write_behind.py
+import unittest
+import os
+import sqlite3
+import tempfile
+import time
+from app.services import db_service
+from app.services.write_behind_service import WriteBehindQueue
+from tests.base import AppTestCase
+
+class WriteBehindQueueTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.database_url = f"sqlite:///{os.path.join(self.tmpdir.name, 'wb.db')}"
+        db = db_service.connect(self.database_url)
+        db.execute("CREATE TABLE events (id INTEGER PRIMARY KEY, value TEXT NOT NULL)")
+        db.commit()
+        db.close()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def count_events(self):
+        db = sqlite3.connect(self.database_url.replace('sqlite:///', ''))
+        try:
+            return db.execute("SELECT COUNT(*) FROM events").fetchone()[0]
+        finally:
+            db.close()
+
+    def test_records_are_written_in_batches(self):
+        writer = WriteBehindQueue(self.database_url, batch_size=50, flush_interval=10)
+        for i in range(120):
+            self.assertTrue(writer.submit("INSERT INTO events (value) VALUES (?)", (str(i),)))
+        self.assertTrue(writer.flush(timeout=5))
+        writer.stop()
+
+        self.assertEqual(self.count_events(), 120)
+        stats = writer.stats()
+        self.assertEqual(stats['written'], 120)
+        self.assertEqual(stats['depth'], 0)
+        self.assertLessEqual(stats['flushes'], 3)
+        self.assertGreaterEqual(stats['max_flush_ms'], stats['avg_flush_ms'])
+
+    def test_stop_drains_pending_records(self):
+        writer = WriteBehindQueue(self.database_url, batch_size=1000, flush_interval=60)
+        for i in range(10):
+            writer.submit("INSERT INTO events (value) VALUES (?)", (str(i),))
+        writer.stop()
+        self.assertEqual(self.count_events(), 10)
+
+    def test_bad_record_does_not_lose_batch(self):
+        writer = WriteBehindQueue(self.database_url, batch_size=10, flush_interval=10)
+        writer.submit("INSERT INTO events (value) VALUES (?)", ('ok',))
+        writer.submit("INSERT INTO events (value) VALUES (?)", (None,)) # Violates NOT NULL
+        writer.submit("INSERT INTO events (value) VALUES (?)", ('also ok',))
+        writer.stop()
+        self.assertEqual(self.count_events(), 2)
+        self.assertEqual(writer.stats()['failed'], 1)
+
+    def test_lossy_mode_drops_when_full(self):
+        writer = WriteBehindQueue(self.database_url, max_size=2, block_when_full=False)
+        writer.start = lambda: None # Keep the writer idle so the queue fills up
+        results = [writer.submit("INSERT INTO events (value) VALUES (?)", (str(i),)) for i in range(3)]
+        self.assertEqual(results, [True, True, False])
+        self.assertEqual(writer.stats()['dropped'], 1)
+        self.assertEqual(writer.stats()['depth'], 2)
+
+    def test_stats_before_first_flush(self):
+        stats = WriteBehindQueue(self.database_url).stats()
+        self.assertNotIn('total_flush_ms', stats)
+        self.assertEqual((stats['depth'], stats['avg_flush_ms']), (0, 0.0))
+
+    def test_depth_includes_batch_in_progress(self):
+        writer = WriteBehindQueue(self.database_url, batch_size=100, flush_interval=60)
+        for i in range(5):
+            writer.submit("INSERT INTO events (value) VALUES (?)", (str(i),))
+        deadline = time.monotonic() + 5
+        while writer._queue.qsize() and time.monotonic() < deadline:
+            time.sleep(0.01) # Until the writer has taken everything into its batch
+        self.assertEqual(writer._queue.qsize(), 0)
+        self.assertEqual(writer.stats()['depth'], 5)
+        writer.stop()
+        self.assertEqual(writer.stats()['depth'], 0)
+
+    def test_flush_without_writer_reports_pending(self):
+        writer = WriteBehindQueue(self.database_url)
+        self.assertTrue(writer.flush(timeout=1))
+        writer.start = lambda: None # No writer thread to drain the queue
+        writer.submit("INSERT INTO events (value) VALUES (?)", ('stuck',))
+        self.assertFalse(writer.flush(timeout=1))
+        self.assertEqual(writer.stats()['depth'], 1)
+
+
+class LastSeenTestCase(AppTestCase):
+    def test_authenticated_request_records_last_seen(self):
+        user = db_service.query_db("SELECT last_seen_at FROM users WHERE username = 'testuser'", one=True)
+        self.assertIsNone(user['last_seen_at'])
+
+        resp = self.client.get('/api/v1/auth/profile', headers=self.auth_headers)
+        self.assertEqual(resp.status_code, 200)
+
+        user = db_service.query_db("SELECT last_seen_at FROM users WHERE username = 'testuser'", one=True)
+        self.assertIsNotNone(user['last_seen_at'])
+
+    def test_health_exposes_queue_stats(self):
+        resp = self.client.get('/health')
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.get_json()['status'], 'ok')
+        self.assertIsNone(resp.get_json()['write_behind']) # 'sync' mode in tests: no queue
+
+if __name__ == '__main__':
+    unittest.main()